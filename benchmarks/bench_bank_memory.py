@@ -0,0 +1,98 @@
+"""
+Measure per-worker memory and load time of the question bank for large banks.
+
+The entries of 'config/sop_questions_0_5_backup.json' (long 'context' strings) are repeated with new
+ids and spread over many files/pages until the bank has '--entries' questions. Each variant runs in a
+fresh subprocess and reports the RSS growth caused by loading the bank:
+-   'json':     the whole JSON bank parsed into dicts (how every worker held the bank before it moved
+                into the 'questions' table)
+-   'bank':     'QuestionBank.refresh()' from the 'questions' table (what a UI worker holds now)
+
+Usage (from the repository root):
+    PYTHONPATH=.:src/database:src/user_interface python benchmarks/bench_bank_memory.py --entries 100000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def rss_kib() -> int:
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('RssAnon:'))
+
+
+def build(tmp: Path, entries: int) -> tuple[Path, Path]:
+    from utils import db_conn, load_yaml
+    from sop_sql.questions_table import CREATE_QUESTIONS_TABLE
+    from sop_sql.question_changes_table import CREATE_QUESTION_CHANGES_TABLE
+
+    source = json.load((ROOT / 'config' / 'sop_questions_0_5_backup.json').open(encoding='utf-8'))
+    bank = []
+    for q_id in range(1, entries + 1):
+        q = source[q_id % len(source)]
+        bank.append({'q_id': q_id, 'file_name': f'SOP-{q_id % 300}_textOnlyV2.docx', 'page': f'page {q_id % 25 + 1}',
+                     'question': q['question'], 'answer': q['answer'], 'context': q['context'], 'model': q['model']})
+
+    json_path = tmp / 'bank.json'
+    json_path.write_text(json.dumps(bank, ensure_ascii=False), encoding='utf-8')
+
+    db = tmp / 'bank.db'
+    with db_conn(str(db)) as (con, cur):
+        cur.execute(CREATE_QUESTIONS_TABLE)
+        cur.execute(CREATE_QUESTION_CHANGES_TABLE)
+        cur.executemany('INSERT INTO questions (question_id, file_name, page, question, answer, context, model) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        [(q['q_id'], q['file_name'], q['page'], q['question'], q['answer'], q['context'], q['model'])
+                         for q in bank])
+    return json_path, db
+
+
+def measure(variant: str, json_path: str, db: str) -> None:
+    from utils import load_yaml
+    from sop_ui.question_bank import QuestionBank
+
+    statements = load_yaml(ROOT / 'config' / 'statements.yml')
+    before = rss_kib()
+    start = time.perf_counter()
+    if variant == 'json':
+        with open(json_path, encoding='utf-8') as f:
+            bank = json.load(f)
+    else:
+        bank = QuestionBank(db=db, statements=statements)
+        bank.refresh()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'variant': variant, 'entries': len(bank), 'rss_mib': (rss_kib() - before) / 1024,
+                      'load_s': elapsed}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--entries', type=int, default=100_000)
+    parser.add_argument('--measure', nargs=3, metavar=('VARIANT', 'JSON', 'DB'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path, db = build(Path(tmp), args.entries)
+        print(f'{args.entries} entries, JSON file {json_path.stat().st_size / 2**20:.1f} MiB')
+        print(f'{"variant":>8} {"RSS MiB":>9} {"load s":>8}')
+        for variant in ('json', 'bank'):
+            out = subprocess.run([sys.executable, __file__, '--measure', variant, str(json_path), str(db)],
+                                 check=True, capture_output=True, text=True, env=os.environ).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            print(f'{variant:>8} {result["rss_mib"]:>9.1f} {result["load_s"]:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
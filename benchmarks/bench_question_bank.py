@@ -0,0 +1,80 @@
+"""
+Benchmark 'get_example_by_id' lookups of the in-memory question bank for growing bank sizes.
+
+For every size a temporary SQLite database is filled with a synthetic 'questions' table and loaded
+into a 'QuestionBank'. The lookup by 'q_id' (dict) is compared with the former linear scan over the
+JSON list plus the per request 'normalize_file_and_page' call.
+
+Usage (from the repository root):
+    PYTHONPATH=.:src/database:src/user_interface python benchmarks/bench_question_bank.py
+"""
+
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+from utils import db_conn, load_yaml, normalize_file_and_page
+from sop_sql.questions_table import CREATE_QUESTIONS_TABLE
+from sop_sql.question_changes_table import CREATE_QUESTION_CHANGES_TABLE
+from sop_ui.question_bank import QuestionBank
+
+SIZES = (150, 10_000, 100_000, 1_000_000)
+
+
+def build_db(db: str, size: int) -> list[dict]:
+    bank = [{'q_id': i, 'file_name': f'doc{i % 97}_textOnlyV2.docx', 'page': f'page {i % 40 + 1}',
+             'question': f'q{i}', 'answer': f'a{i}'} for i in range(1, size + 1)]
+    with db_conn(db) as (con, cur):
+        cur.execute(CREATE_QUESTIONS_TABLE)
+        cur.execute(CREATE_QUESTION_CHANGES_TABLE)
+        cur.executemany('INSERT INTO questions (question_id, file_name, page, question, answer) VALUES (?, ?, ?, ?, ?)',
+                        [(q['q_id'], q['file_name'], q['page'], q['question'], q['answer']) for q in bank])
+    return bank
+
+
+def linear_lookup(data: list[dict], q_id: int) -> tuple:
+    for q in data:
+        if q.get('q_id') == q_id:
+            file_name, file_page = normalize_file_and_page(q['file_name'], q['page'])
+            return q['q_id'], q['question'], q['answer'], file_name, file_page
+
+
+def timed(lookup, q_ids: list[int]) -> tuple[float, float]:
+    timings = []
+    for q_id in q_ids:
+        start = time.perf_counter()
+        lookup(q_id)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return statistics.mean(timings), statistics.quantiles(timings, n=20)[-1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lookups', type=int, default=10_000)
+    parser.add_argument('--scans', type=int, default=20, help='lookups timed for the linear scan')
+    args = parser.parse_args()
+
+    statements = load_yaml(Path(__file__).resolve().parents[1] / 'config' / 'statements.yml')
+    print(f'{"entries":>9} {"load s":>8} {"dict mean us":>13} {"dict p95 us":>12} {"scan mean us":>13}')
+
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = str(Path(tmp) / 'bench.db')
+            data = build_db(db, size)
+
+            bank = QuestionBank(db=db, statements=statements)
+            start = time.perf_counter()
+            bank.refresh()
+            load_s = time.perf_counter() - start
+
+            mean, p95 = timed(bank.get, [random.randint(1, size) for _ in range(args.lookups)])
+            scan_mean, _ = timed(lambda q_id: linear_lookup(data, q_id),
+                                 [random.randint(1, size) for _ in range(args.scans)])
+            print(f'{size:>9} {load_s:>8.2f} {mean:>13.3f} {p95:>12.3f} {scan_mean:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
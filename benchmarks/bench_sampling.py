@@ -0,0 +1,91 @@
+"""
+Benchmark per-request latency of the sampling modes of 'utils.database.sampling()'.
+
+A temporary SQLite database is created with the production schemas, filled with a synthetic
+question bank and annotated so that the given share of questions is exhausted (two annotations).
+Every mode then serves the same number of requests for a third user of the same function.
+
+Usage (from the repository root):
+    PYTHONPATH=.:src/database python benchmarks/bench_sampling.py --questions 1000 --requests 50
+"""
+
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+from utils import db_conn, load_yaml, sampling
+from utils.database.question_index import question_index
+from sop_sql.function_table import CREATE_FUNCTION_TABLE
+from sop_sql.user_table import CREATE_USER_TABLE
+from sop_sql.annotations_table import CREATE_ANNOTATION_TABLE
+from sop_sql.questions_table import CREATE_QUESTIONS_TABLE
+from sop_sql.question_changes_table import CREATE_QUESTION_CHANGES_TABLE
+from sop_sql.leases_table import CREATE_LEASE_TABLE
+
+COVERAGES = (0.10, 0.50, 0.90, 0.99)
+MODES = ('random', 'sql', 'index')
+
+
+def build_db(db: str, n_questions: int, coverage: float) -> None:
+    bank = [(i, 'bench.pdf', 'page 1', f'q{i}', f'a{i}') for i in range(1, n_questions + 1)]
+    exhausted = random.sample(range(1, n_questions + 1), int(n_questions * coverage))
+
+    with db_conn(db) as (con, cur):
+        cur.execute(CREATE_FUNCTION_TABLE)
+        cur.execute(CREATE_USER_TABLE)
+        cur.execute(CREATE_ANNOTATION_TABLE)
+        cur.execute(CREATE_QUESTIONS_TABLE)
+        cur.execute(CREATE_QUESTION_CHANGES_TABLE)
+        cur.execute(CREATE_LEASE_TABLE)
+        cur.executemany('INSERT INTO questions (question_id, file_name, page, question, answer) '
+                        'VALUES (?, ?, ?, ?, ?)', bank)
+        cur.execute('INSERT INTO function (function_name) VALUES (?)', ('bench',))
+        cur.executemany('INSERT INTO user (First_name, Surname, function, years_in_the_function, username) '
+                        'VALUES (?, ?, 1, 1, ?)', [('a', 'a', 'a'), ('b', 'b', 'b'), ('c', 'c', 'c')])
+        rows = [(f'q{q_id}', q_id, 'bench.pdf', '1', f'a{q_id}', annotator)
+                for q_id in exhausted for annotator in (1, 2)]
+        cur.executemany('INSERT INTO annotations (question, question_id, file_name, file_page, answer, annotator) '
+                        'VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+
+def run(statements: dict, mode: str, n_requests: int) -> list[float]:
+    timings = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        sampling(statements=statements, usr_id=3, fun_id=1, mode=mode)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--questions', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    # Without leases every request runs the sampler instead of serving the held question again
+    os.environ.setdefault('LEASE_TTL', '0')
+    statements = load_yaml(Path(__file__).resolve().parents[1] / 'config' / 'statements.yml')
+    print(f'{"coverage":>8} {"mode":>7} {"mean ms":>9} {"p95 ms":>9}')
+
+    for coverage in COVERAGES:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ['DATA_DIR'] = str(Path(tmp) / 'bench.db')
+            build_db(os.environ['DATA_DIR'], args.questions, coverage)
+
+            for mode in MODES:
+                # fresh index per database, seeding happens outside the timed requests
+                question_index.reset()
+                sampling(statements=statements, usr_id=3, fun_id=1, mode=mode)
+
+                timings = run(statements, mode, args.requests)
+                p95 = statistics.quantiles(timings, n=20)[-1]
+                print(f'{coverage:>8.0%} {mode:>7} {statistics.mean(timings):>9.3f} {p95:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+import os
+import csv
+import json
+import hashlib
+import argparse
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Iterator
+
+from utils import setup_logging, get_logger, __load_env, load_yaml, db_conn, normalize_file_and_page
+from .ingest import read_records
+
+# Keys of an entry in the per-page question bank format (config/sop_qas_per_page_v2.json)
+BANK_KEYS = ('q_id', 'file_name', 'page', 'question', 'answer', 'context', 'model')
+
+
+@lru_cache(maxsize=4096)
+def _pdf_exists(file_dir: str, pdf_file: str) -> bool:
+    return (Path(file_dir) / pdf_file).is_file()
+
+
+def normalize_record(record: dict, file_dir: str | None) -> tuple[dict | None, str | None]:
+    """
+    Normalize one raw model output into a per-page bank entry (without 'q_id').
+
+    The page is rewritten to 'page <number>' and the referenced PDF (after 'normalize_file_and_page')
+    must exist in 'file_dir' if one is given.
+
+    Returns:
+        tuple[dict | None, str | None]: The entry and 'None', or 'None' and the reason it was rejected.
+    """
+
+    question = str(record.get('question') or '').strip()
+    answer = str(record.get('answer') or '').strip()
+    file_name = str(record.get('file_name') or '').strip()
+    page = str(record.get('page') or '').strip()
+    if not question or not answer:
+        return None, 'question or answer missing'
+    if not file_name or not page:
+        return None, 'file_name or page missing'
+
+    try:
+        pdf_file, page_number = normalize_file_and_page(file_name, page)
+    except RuntimeError as e:
+        return None, str(e)
+    if file_dir and not _pdf_exists(file_dir, pdf_file):
+        return None, f'PDF not found: {pdf_file}'
+
+    entry = {'file_name': file_name, 'page': f'page {page_number}', 'question': question, 'answer': answer}
+    for key in ('context', 'model'):
+        if record.get(key):
+            entry[key] = record[key]
+    return entry, None
+
+
+def normalize_chunk(records: list[dict], file_dir: str | None) -> list[tuple[dict | None, str | None]]:
+    """
+    Process pool task: normalize a chunk of records, keeping their order.
+    """
+
+    return [normalize_record(record, file_dir) for record in records]
+
+
+def _chunks(records: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    while chunk := list(islice(records, size)):
+        yield chunk
+
+
+def _key(entry: dict) -> bytes:
+    raw = '\x1f'.join((entry['file_name'], entry['page'], entry['question']))
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=12).digest()
+
+
+class QIdRegistry:
+    """
+    Stable 'q_id' assignment: a question that is already in the 'questions' table (same file, page and
+    question text) keeps its id, new questions get the next ids after the largest existing one in input
+    order. Duplicates within the input get the id of their first occurrence.
+    """
+
+    def __init__(self, cur, statements: dict):
+        self._cur = cur
+        self._statements = statements
+        self._seen: dict[bytes, int] = {}
+        max_q_id = cur.execute(statements['SELECT_MAX_QUESTION_ID']).fetchone()[0]
+        self._next = (max_q_id or 0) + 1
+
+    def assign(self, entry: dict) -> tuple[int, bool]:
+        """
+        Returns:
+            tuple[int, bool]: The 'q_id' and whether the entry was seen before in this run.
+        """
+
+        key = _key(entry)
+        if key in self._seen:
+            return self._seen[key], True
+
+        row = self._cur.execute(self._statements['SELECT_QUESTION_ID_BY_KEY'],
+                                (entry['file_name'], entry['page'], entry['question'])).fetchone()
+        if row is not None:
+            q_id = row[0]
+        else:
+            q_id = self._next
+            self._next += 1
+        self._seen[key] = q_id
+        return q_id, False
+
+
+def main() -> None:
+    """
+    Build a per-page question bank from raw model outputs (CSV or JSONL, any size).
+
+    Records need 'question', 'answer', 'file_name' and 'page' ('context' and 'model' are kept if present).
+    The files are streamed in chunks to a process pool, at most two chunks per worker are in flight, so
+    memory stays bounded by the chunk size. The bank is written as a JSON list (atomic replace) and can
+    be imported into the questions table right away with '--import'.
+    """
+
+    parser = argparse.ArgumentParser(description='Build a per-page question bank from raw model outputs')
+    parser.add_argument('files', nargs='+', type=Path, help='.csv or .jsonl files with one model output per row')
+    parser.add_argument('--output', type=Path, required=True, help='JSON question bank to write')
+    parser.add_argument('--import', dest='import_db', action='store_true', help='also import into the questions table')
+    parser.add_argument('--file-dir', default=os.getenv('FILE_DIR'), help='PDF directory, defaults to $FILE_DIR')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes for normalization')
+    parser.add_argument('--chunk-size', type=int, default=2000, help='records per task')
+    parser.add_argument('--report', type=Path, help='write rejected and duplicate records to this CSV file')
+    args = parser.parse_args()
+
+    loaded_from = __load_env(cwd=Path(__file__).resolve())
+    setup_logging(app_name='database', log_dir=os.getenv('DB_LOG_DIR'), to_stdout=False)
+    build_log = get_logger(__name__)
+    build_log.info(f".env loaded from: {loaded_from}")
+    if not args.file_dir:
+        build_log.warning('No PDF directory given, referenced PDFs are not validated')
+
+    statements = load_yaml()
+    counts = Counter()
+    tmp_path = args.output.with_name(f'.{args.output.name}.{os.getpid()}.tmp')
+    report_file = args.report.open('w', encoding='utf-8', newline='') if args.report else None
+    report = csv.writer(report_file) if report_file else None
+    if report:
+        report.writerow(('file', 'row', 'status', 'reason'))
+
+    try:
+        with db_conn(os.getenv('DATA_DIR')) as (con, cur), tmp_path.open('w', encoding='utf-8') as out, \
+                ProcessPoolExecutor(max_workers=args.workers) as pool:
+            registry = QIdRegistry(cur, statements)
+            out.write('[')
+
+            for path in args.files:
+                chunks = _chunks(iter(read_records(path)), args.chunk_size)
+                pending = deque()
+                row = -1  # index of the record in its file, as in the sop-sql-ingest report
+
+                while True:
+                    # At most two chunks per worker in flight, the input is never read ahead further
+                    while len(pending) < 2 * args.workers and (chunk := next(chunks, None)) is not None:
+                        pending.append(pool.submit(normalize_chunk, chunk, args.file_dir))
+                    if not pending:
+                        break
+
+                    rows = []
+                    for entry, reason in pending.popleft().result():
+                        row += 1
+                        if entry is None:
+                            status = 'rejected'
+                        else:
+                            q_id, duplicate = registry.assign(entry)
+                            status = 'duplicate' if duplicate else 'accepted'
+                            reason = f'same question as q_id {q_id}' if duplicate else None
+
+                        counts[status] += 1
+                        if status != 'accepted':
+                            if report:
+                                report.writerow((str(path), row, status, reason))
+                            continue
+
+                        entry = {'q_id': q_id, **entry}
+                        out.write(('\n' if counts['accepted'] == 1 else ',\n') + json.dumps(entry, ensure_ascii=False))
+                        rows.append(tuple(entry.get(key) for key in BANK_KEYS))
+
+                    if args.import_db and rows:
+                        cur.executemany(statements['INSERT_IN_QUESTION'], rows)
+                        con.commit()
+
+            out.write('\n]\n')
+            out.flush()
+            os.fsync(out.fileno())
+
+        os.replace(tmp_path, args.output)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+        if report_file:
+            report_file.close()
+
+    build_log.info(f'Question bank {args.output} built: {dict(counts)}')
+    print(f"{args.output}: {counts['accepted']} accepted, {counts['duplicate']} duplicate, "
+          f"{counts['rejected']} rejected")
+
+
+if __name__ == '__main__':
+    main()
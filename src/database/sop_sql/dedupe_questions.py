@@ -0,0 +1,91 @@
+import os
+import csv
+import json
+import argparse
+from collections import Counter
+from pathlib import Path
+
+from utils import setup_logging, get_logger, __load_env, load_yaml, db_conn, normalize_file_and_page, \
+    NearDuplicateIndex
+
+
+def main() -> None:
+    """
+    Find (and optionally delete) near-duplicate questions in the questions table.
+
+    Questions are compared within their PDF page with a MinHash/LSH index ('NearDuplicateIndex'). The
+    question with the lowest 'q_id' of a group of near-duplicates is kept. The table is read page by page,
+    so only the signatures of one page are held in memory. With '--delete' duplicates are removed unless
+    they were already annotated, the UI and the sampler pick up the deletions through 'question_changes'.
+    """
+
+    parser = argparse.ArgumentParser(description='Find near-duplicate questions in the questions table')
+    parser.add_argument('--threshold', type=float, default=0.8, help='estimated Jaccard similarity of a duplicate')
+    parser.add_argument('--report', type=Path, help='write the near-duplicates to this CSV file')
+    parser.add_argument('--delete', action='store_true', help='delete near-duplicates without annotations')
+    args = parser.parse_args()
+
+    loaded_from = __load_env(cwd=Path(__file__).resolve())
+    setup_logging(app_name='database', log_dir=os.getenv('DB_LOG_DIR'), to_stdout=False)
+    dedupe_log = get_logger(__name__)
+    dedupe_log.info(f".env loaded from: {loaded_from}")
+
+    statements = load_yaml()
+    index = NearDuplicateIndex(threshold=args.threshold)
+    counts = Counter()
+    report_file = args.report.open('w', encoding='utf-8', newline='') if args.report else None
+    report = csv.writer(report_file) if report_file else None
+    if report:
+        report.writerow(('q_id', 'duplicate_of', 'similarity', 'file', 'page', 'question', 'action'))
+
+    try:
+        with db_conn(os.getenv('DATA_DIR')) as (con, cur):
+            # First pass: group the ids by PDF page (alternatives store the normalized file name and page)
+            pages: dict[tuple[str, int], list[int]] = {}
+            for q_id, file_name, page, _, _ in cur.execute(statements['SELECT_QUESTIONS_AFTER'], (0,)):
+                try:
+                    key = normalize_file_and_page(file_name or '', page or '')
+                except RuntimeError:
+                    counts['invalid page'] += 1
+                    continue
+                pages.setdefault(key, []).append(q_id)
+            annotated = {row[0] for row in cur.execute(statements['SELECT_ANNOTATED_QUESTION_IDS'])}
+
+            for key, q_ids in pages.items():
+                if len(q_ids) < 2:
+                    continue
+                rows = cur.execute(statements['SELECT_QUESTIONS_BY_IDS'], (json.dumps(q_ids),)).fetchall()
+                deleted = []
+                for q_id, _, _, question, _ in sorted(rows):
+                    matches = index.query(key, question)
+                    if not matches:
+                        index.add(key, q_id, question)
+                        continue
+
+                    kept_id, similarity = matches[0]
+                    if not args.delete:
+                        action = 'reported'
+                    elif q_id in annotated:
+                        action = 'kept (annotated)'
+                    else:
+                        action = 'deleted'
+                        deleted.append((q_id,))
+                    counts[action] += 1
+                    if report:
+                        report.writerow((q_id, kept_id, f'{similarity:.2f}', *key, question, action))
+                index.drop(key)
+
+                if deleted:
+                    cur.executemany(statements['DELETE_ROW'], deleted)
+                    con.commit()
+    finally:
+        if report_file:
+            report_file.close()
+
+    dedupe_log.info(f'Near-duplicate questions (threshold {args.threshold}): {dict(counts)}')
+    print(f"{sum(counts[a] for a in ('reported', 'kept (annotated)', 'deleted'))} near-duplicates found, "
+          f"{counts['deleted']} deleted")
+
+
+if __name__ == '__main__':
+    main()
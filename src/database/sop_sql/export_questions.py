@@ -0,0 +1,29 @@
+import os
+import argparse
+from pathlib import Path
+
+from utils import setup_logging, get_logger, __load_env, load_yaml, export_question_bank
+
+
+def main() -> None:
+    """
+    Fold the questions table (including the alternatives added in the UI) back into a JSON question bank.
+
+    The target file is replaced atomically, it can safely be the file in '$DATA_DIR_QUESTIONS'.
+    """
+
+    parser = argparse.ArgumentParser(description='Export the questions table to a JSON question bank')
+    parser.add_argument('file', type=Path, help='target JSON file')
+    args = parser.parse_args()
+
+    loaded_from = __load_env(cwd=Path(__file__).resolve())
+    setup_logging(app_name='database', log_dir=os.getenv('DB_LOG_DIR'), to_stdout=False)
+    export_log = get_logger(__name__)
+    export_log.info(f".env loaded from: {loaded_from}")
+
+    exported = export_question_bank(db=os.getenv('DATA_DIR'), statements=load_yaml(), json_path=args.file)
+    print(f'{args.file}: {exported} questions exported')
+
+
+if __name__ == '__main__':
+    main()
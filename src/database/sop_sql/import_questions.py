@@ -0,0 +1,31 @@
+import os
+import argparse
+from pathlib import Path
+
+from utils import setup_logging, get_logger, __load_env, load_yaml, import_question_bank
+
+
+def main() -> None:
+    """
+    Import JSON question banks into the questions table.
+
+    Entries keep their 'q_id', ids that already exist in the table are skipped.
+    """
+
+    parser = argparse.ArgumentParser(description='Import JSON question banks into the questions table')
+    parser.add_argument('files', nargs='+', type=Path, help='JSON files with a list of question objects')
+    args = parser.parse_args()
+
+    loaded_from = __load_env(cwd=Path(__file__).resolve())
+    setup_logging(app_name='database', log_dir=os.getenv('DB_LOG_DIR'), to_stdout=False)
+    import_log = get_logger(__name__)
+    import_log.info(f".env loaded from: {loaded_from}")
+
+    statements = load_yaml()
+    for path in args.files:
+        imported = import_question_bank(json_path=path, db=os.getenv('DATA_DIR'), statements=statements)
+        print(f'{path}: {imported} questions imported')
+
+
+if __name__ == '__main__':
+    main()
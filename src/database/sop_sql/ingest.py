@@ -0,0 +1,116 @@
+import os
+import csv
+import json
+import argparse
+from collections import Counter
+from pathlib import Path
+from typing import Iterator
+
+from utils import setup_logging, get_logger, __load_env, load_yaml, push_annotations
+
+# Column order of INSERT_IN_ANNOTATION in /config/statements.yml
+ANNOTATION_COLUMNS = ('question', 'question_id', 'alt_question', 'file_name', 'file_page', 'answer', 'alt_answer',
+                      'question_accepted', 'question_clarity', 'question_relevance', 'question_context_fit',
+                      'fluent', 'comprehensive', 'factual', 'annotator')
+INTEGER_COLUMNS = {'question_id', 'question_accepted', 'question_clarity', 'question_relevance',
+                   'question_context_fit', 'fluent', 'comprehensive', 'factual', 'annotator'}
+# Key columns, a row without integer values here is rejected before it reaches the database
+KEY_COLUMNS = ('question_id', 'annotator')
+
+
+def read_records(path: Path) -> Iterator[dict]:
+    """
+    Stream annotation records from a '.csv' (with header) or '.jsonl' file.
+    """
+
+    with path.open('r', encoding='utf-8', newline='') as file:
+        if path.suffix.lower() == '.csv':
+            yield from csv.DictReader(file)
+        elif path.suffix.lower() in ('.jsonl', '.ndjson'):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise ValueError(f'Unsupported file type "{path.suffix}", expected .csv or .jsonl')
+
+
+def to_row(record: dict) -> tuple:
+    """
+    Convert one record into a row in 'ANNOTATION_COLUMNS' order. Empty values become NULL.
+
+    Other values that can not be converted are passed through unchanged, the table constraints decide on them.
+
+    Raises:
+        ValueError: If 'question_id' or 'annotator' is missing or not an integer.
+    """
+
+    row = []
+    for column in ANNOTATION_COLUMNS:
+        value = record.get(column)
+        if value == '':
+            value = None
+        if column in INTEGER_COLUMNS and isinstance(value, (str, bool)):
+            try:
+                value = int(value)
+            except ValueError:
+                pass
+        if column in KEY_COLUMNS and not isinstance(value, int):
+            raise ValueError(f'{column} {value!r} is not an integer')
+        row.append(value)
+    return tuple(row)
+
+
+def main() -> None:
+    """
+    Load annotations collected offline (CSV or JSONL) into the annotations table.
+
+    Every row is reported as accepted, duplicate (same question_id and annotator already present) or
+    rejected (wrong shape or constraint violation). Rows that were not accepted can be written to a
+    CSV report with '--report'.
+    """
+
+    parser = argparse.ArgumentParser(description='Bulk load annotations from CSV/JSONL files')
+    parser.add_argument('files', nargs='+', type=Path, help='.csv or .jsonl files with one annotation per row')
+    parser.add_argument('--chunk-size', type=int, default=500, help='rows per transaction')
+    parser.add_argument('--report', type=Path, help='write duplicate and rejected rows to this CSV file')
+    args = parser.parse_args()
+
+    loaded_from = __load_env(cwd=Path(__file__).resolve())
+    setup_logging(app_name='database', log_dir=os.getenv('DB_LOG_DIR'), to_stdout=False)
+    ingest_log = get_logger(__name__)
+    ingest_log.info(f".env loaded from: {loaded_from}")
+
+    statements = load_yaml()
+    report = []
+    for path in args.files:
+        rejected = []
+        # Position in the file of every row passed on to push_annotations
+        positions = []
+
+        def rows():
+            for idx, record in enumerate(read_records(path)):
+                try:
+                    row = to_row(record)
+                except ValueError as e:
+                    rejected.append((idx, 'rejected', str(e)))
+                    continue
+                positions.append(idx)
+                yield row
+
+        results = push_annotations(rows=rows(), db=os.getenv('DATA_DIR'), statements=statements,
+                                   chunk_size=args.chunk_size)
+        results = sorted(rejected + [(positions[idx], status, reason) for idx, status, reason in results])
+        counts = Counter(status for _, status, _ in results)
+        ingest_log.info(f'{path}: {dict(counts)}')
+        print(f"{path}: {counts['accepted']} accepted, {counts['duplicate']} duplicate, {counts['rejected']} rejected")
+        report += [(str(path), idx, status, reason) for idx, status, reason in results if status != 'accepted']
+
+    if args.report:
+        with args.report.open('w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(('file', 'row', 'status', 'reason'))
+            writer.writerows(report)
+
+
+if __name__ == '__main__':
+    main()
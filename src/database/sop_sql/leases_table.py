@@ -0,0 +1,11 @@
+# This is the Schema to create the question_leases table
+CREATE_LEASE_TABLE = """
+CREATE TABLE IF NOT EXISTS question_leases (
+    question_id INTEGER NOT NULL,
+    annotator INTEGER NOT NULL,
+    function INTEGER,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (question_id, annotator),
+    FOREIGN KEY (annotator) REFERENCES user(Id)
+);
+"""
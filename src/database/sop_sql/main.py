@@ -1,10 +1,15 @@
 import os
 from pathlib import Path
 
-from utils import setup_logging, get_logger, __load_env, db_conn, preview_db
+from utils import setup_logging, get_logger, __load_env, db_conn, preview_db, load_yaml, import_question_bank
 from .function_table import CREATE_FUNCTION_TABLE
 from .user_table import CREATE_USER_TABLE
 from .annotations_table import CREATE_ANNOTATION_TABLE
+from .leases_table import CREATE_LEASE_TABLE
+from .skips_table import CREATE_SKIPS_TABLE
+from .questions_table import CREATE_QUESTIONS_TABLE
+from .question_changes_table import CREATE_QUESTION_CHANGES_TABLE
+from .migrations import migrate, check_query_plans
 
 def main():
     cwd = Path(__file__).resolve()
@@ -16,11 +21,26 @@ def main():
     db_log.info('---- Database script running ----')
 
     db_path = os.getenv('DATA_DIR')
+    statements = load_yaml()
 
     with db_conn(db_path) as (con, cur):
         cur.execute(CREATE_FUNCTION_TABLE)
         cur.execute(CREATE_USER_TABLE)
         cur.execute(CREATE_ANNOTATION_TABLE)
+        cur.execute(CREATE_LEASE_TABLE)
+        cur.execute(CREATE_SKIPS_TABLE)
+        cur.execute(CREATE_QUESTIONS_TABLE)
+        cur.execute(CREATE_QUESTION_CHANGES_TABLE)
+
+        version = migrate(con)
+        db_log.info(f'Database schema at version {version}')
+        check_query_plans(cur=cur, statements=statements)
+
+    # Question bank from $DATA_DIR_QUESTIONS, already imported ids are skipped
+    q_bank_path = os.getenv('DATA_DIR_QUESTIONS')
+    if q_bank_path:
+        imported = import_question_bank(json_path=q_bank_path, db=db_path, statements=statements)
+        db_log.info(f'{imported} questions imported from {q_bank_path}')
 
     preview_db(db_path)
 
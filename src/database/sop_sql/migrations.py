@@ -0,0 +1,178 @@
+import re
+import sqlite3
+import logging
+
+log = logging.getLogger(__name__)
+
+# Identity of a user, NULL years count as equal (a plain UNIQUE index treats NULLs as distinct)
+USER_IDENTITY = 'First_name, Surname, function, IFNULL(years_in_the_function, -1), username'
+
+
+def _archive_annotations(con: sqlite3.Connection, where: str, params: tuple = ()) -> int:
+    # Removed annotation rows are kept in 'annotations_removed' (same columns, no constraints)
+    con.execute('CREATE TABLE IF NOT EXISTS annotations_removed AS SELECT * FROM annotations WHERE 0')
+    con.execute(f'INSERT INTO annotations_removed SELECT * FROM annotations WHERE {where}', params)
+    return con.execute(f'DELETE FROM annotations WHERE {where}', params).rowcount
+
+
+def _dedupe_annotations(con: sqlite3.Connection) -> None:
+    """
+    Keep only the latest row (highest Id) per (question_id, annotator) before the UNIQUE index is created.
+
+    Older versions only rejected exact duplicates, so a resubmit with other ratings stored a second row.
+    """
+
+    removed = _archive_annotations(con, 'question_id IS NOT NULL AND Id NOT IN '
+                                        '(SELECT MAX(Id) FROM annotations GROUP BY question_id, annotator)')
+    if removed:
+        log.warning('Moved %s duplicate annotations (same question and annotator, older rows) to '
+                    'annotations_removed', removed)
+
+
+def _dedupe_users(con: sqlite3.Connection) -> None:
+    """
+    Merge users with the same identity ('USER_IDENTITY') into the oldest one.
+
+    Annotations, leases and skips of a merged user are moved to the kept user. Annotations the kept user
+    already has for the same question are moved to 'annotations_removed' instead.
+    """
+
+    pairs = con.execute(f'SELECT Id, keep FROM (SELECT Id, MIN(Id) OVER (PARTITION BY {USER_IDENTITY}) AS keep '
+                        f'FROM user) WHERE Id != keep').fetchall()
+    for dup, keep in pairs:
+        for table in ('annotations', 'question_leases', 'question_skips'):
+            con.execute(f'UPDATE OR IGNORE {table} SET annotator = ? WHERE annotator = ?', (keep, dup))
+        removed = _archive_annotations(con, 'annotator = ?', (dup,))
+        con.execute('DELETE FROM question_leases WHERE annotator = ?', (dup,))
+        con.execute('DELETE FROM question_skips WHERE annotator = ?', (dup,))
+        con.execute('DELETE FROM user WHERE Id = ?', (dup,))
+        log.warning('Merged user %s into user %s (same identity), %s conflicting annotations moved to '
+                    'annotations_removed', dup, keep, removed)
+
+
+# Ordered schema migrations (version, description, steps). A step is an SQL statement or a function called
+# with the connection. The applied version is stored in 'PRAGMA user_version', so every migration runs exactly
+# once per database file.
+MIGRATIONS = [
+    (1, 'Indexes for hot lookups', [
+        'CREATE INDEX IF NOT EXISTS idx_user_username ON user (username)',
+        'CREATE INDEX IF NOT EXISTS idx_leases_annotator ON question_leases (annotator, function)',
+        'CREATE INDEX IF NOT EXISTS idx_leases_expires ON question_leases (expires_at)',
+    ]),
+    (2, 'UNIQUE constraints for duplicate detection', [
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_function_name ON function (function_name)',
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_user_identity '
+        'ON user (First_name, Surname, function, years_in_the_function, username)',
+        _dedupe_annotations,
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_annotations_question_annotator ON annotations (question_id, annotator)',
+    ]),
+    (3, 'Indexes on foreign key child columns (checked by SQLite on every parent insert)', [
+        'CREATE INDEX IF NOT EXISTS idx_user_function ON user (function)',
+        'CREATE INDEX IF NOT EXISTS idx_annotations_annotator ON annotations (annotator)',
+    ]),
+    (4, 'Question bank lookups by source file', [
+        'CREATE INDEX IF NOT EXISTS idx_questions_file ON questions (file_name, page)',
+    ]),
+    (5, 'Question bank change log for cross-process reloads', [
+        'CREATE TRIGGER IF NOT EXISTS trg_questions_insert AFTER INSERT ON questions BEGIN '
+        'INSERT INTO question_changes (question_id) VALUES (NEW.question_id); END',
+        'CREATE TRIGGER IF NOT EXISTS trg_questions_update AFTER UPDATE ON questions BEGIN '
+        'INSERT INTO question_changes (question_id) VALUES (OLD.question_id); '
+        'INSERT INTO question_changes (question_id) VALUES (NEW.question_id); END',
+        'CREATE TRIGGER IF NOT EXISTS trg_questions_delete AFTER DELETE ON questions BEGIN '
+        'INSERT INTO question_changes (question_id) VALUES (OLD.question_id); END',
+    ]),
+    (6, 'Question lookups by file, page and question text', [
+        'CREATE INDEX IF NOT EXISTS idx_questions_key ON questions (file_name, page, question)',
+        'DROP INDEX IF EXISTS idx_questions_file',
+    ]),
+    (7, 'User identity with NULL years', [
+        _dedupe_users,
+        'DROP INDEX IF EXISTS uq_user_identity',
+        f'CREATE UNIQUE INDEX uq_user_identity ON user ({USER_IDENTITY})',
+    ]),
+]
+
+# Statements that read whole tables on purpose and are therefore excluded from the plan check
+FULL_SCAN_STATEMENTS = {'INSERT_INTO', 'SELECT_ALL', 'SELECT_ANNOTATION_INDEX', 'SELECT_ANNOTATION_ELIGIBILITY',
+                        'SELECT_LENGTH', 'SELECT_QUESTIONS_EXPORT', 'SELECT_ANNOTATED_QUESTION_IDS'}
+
+
+def migrate(con: sqlite3.Connection) -> int:
+    """
+    Apply all pending migrations to the database.
+
+    Each migration runs in its own transaction together with the 'user_version' bump, so a failing
+    migration leaves the database at the last successfully applied version.
+
+    Args:
+        con (sqlite3.Connection): Open connection to the database.
+
+    Returns:
+        int: The schema version after migrating.
+
+    Raises:
+        sqlite3.Error: If a migration fails, it is rolled back.
+    """
+
+    version = con.execute('PRAGMA user_version').fetchone()[0]
+    for number, description, steps in MIGRATIONS:
+        if number <= version:
+            continue
+
+        log.info('Applying migration %s: %s', number, description)
+        con.commit()
+        con.execute('BEGIN')
+        try:
+            for step in steps:
+                if callable(step):
+                    step(con)
+                else:
+                    con.execute(step)
+            con.execute(f'PRAGMA user_version = {number}')
+            con.commit()
+        except sqlite3.Error:
+            con.rollback()
+            log.exception('Migration %s failed, database stays at version %s', number, version)
+            raise
+        version = number
+
+    return version
+
+
+def check_query_plans(cur: sqlite3.Cursor, statements: dict) -> None:
+    """
+    Run 'EXPLAIN QUERY PLAN' for every statement in statements.yml and fail if one falls back to a table scan.
+
+    Statements in 'FULL_SCAN_STATEMENTS' are skipped, statements on tables that do not exist yet are logged
+    and skipped.
+
+    Args:
+        cur (sqlite3.Cursor):   Active SQLite cursor.
+        statements (dict):      SQL statement mapping from /config/statements.yml
+
+    Raises:
+        RuntimeError: If one or more statements scan a table.
+    """
+
+    scans = []
+    for name, sql in statements.items():
+        if name in FULL_SCAN_STATEMENTS:
+            continue
+
+        sql = sql.format(function='', table='', column_names='*', col_names='', tuple_q_marks='')
+        named = re.findall(r':(\w+)', sql)
+        params = {key: None for key in named} if named else [None] * sql.count('?')
+
+        try:
+            plan = cur.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+        except sqlite3.OperationalError as e:
+            log.warning('Query plan of %s not checked: %s', name, e)
+            continue
+
+        # Virtual tables (e.g. json_each over a bound parameter) do not read stored rows
+        scans += [f'{name}: {row[3]}' for row in plan if row[3].startswith('SCAN') and 'VIRTUAL TABLE' not in row[3]]
+
+    if scans:
+        raise RuntimeError('Statements fall back to a table scan: ' + ' | '.join(scans))
+    log.info('Query plans checked, no table scans')
@@ -0,0 +1,7 @@
+# This is the Schema to create the question_changes table (change log of the questions table, filled by triggers)
+CREATE_QUESTION_CHANGES_TABLE = """
+CREATE TABLE IF NOT EXISTS question_changes (
+    generation INTEGER PRIMARY KEY AUTOINCREMENT,
+    question_id INTEGER NOT NULL
+);
+"""
@@ -0,0 +1,15 @@
+# This is the Schema to create the questions table (question bank, imported from the JSON files)
+CREATE_QUESTIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS questions (
+    question_id INTEGER PRIMARY KEY AUTOINCREMENT,
+
+    file_name TEXT,
+    page TEXT,
+
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+
+    context TEXT,
+    model TEXT
+);
+"""
@@ -0,0 +1,10 @@
+# This is the Schema to create the question_skips table (one bitmap of skipped q_ids per user and function)
+CREATE_SKIPS_TABLE = """
+CREATE TABLE IF NOT EXISTS question_skips (
+    annotator INTEGER NOT NULL,
+    function INTEGER NOT NULL,
+    skipped BLOB NOT NULL,
+    PRIMARY KEY (annotator, function),
+    FOREIGN KEY (annotator) REFERENCES user(Id)
+);
+"""
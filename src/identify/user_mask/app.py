@@ -5,7 +5,11 @@ import requests
 from flask import Flask, render_template, request, redirect, url_for, Response, jsonify
 from pathlib import Path
 
-from utils import setup_logging, get_logger, __load_env, load_yaml, db_push, preview_db, get_user_pk_and_func_by_username
+from utils import setup_logging, get_logger, __load_env, load_yaml, db_push, preview_db, get_user_pk_and_func_by_username, \
+    db_health, table_columns, iter_table_rows
+from .ui_client import UIClient, filter_headers, parse_timeouts, HOP_BY_HOP_HEADERS
+from .circuit_breaker import CircuitOpenError
+from .in_process import InProcessUI
 
 # Setup
 cwd = Path(__file__).resolve()
@@ -14,6 +18,31 @@ statements = load_yaml()
 db_path = os.getenv('DATA_DIR')
 UI_HOST = os.getenv('SOP_UI_HOST', 'ui')  # Service name from docker compose
 UI_PORT = os.getenv('SOP_UI_PORT', '8000')
+# Single-process mode: serve the UI routes with sop_ui in this process instead of proxying to the ui container
+UI_IN_PROCESS = os.getenv('UI_IN_PROCESS', 'false').strip().lower() in ('1', 'true', 'yes')
+
+# One pooled keep-alive client per process, shared by all proxied routes
+ui_client = UIClient(
+    host=UI_HOST,
+    port=UI_PORT,
+    pool_size=int(os.getenv('UI_POOL_SIZE', '10')),
+    connect_timeout=float(os.getenv('UI_CONNECT_TIMEOUT', '2')),
+    breaker={
+        'failure_rate': float(os.getenv('UI_BREAKER_FAILURE_RATE', '0.5')),
+        'slow_call': float(os.getenv('UI_BREAKER_SLOW_CALL', '2')),
+        'open_seconds': float(os.getenv('UI_BREAKER_OPEN_SECONDS', '10')),
+    }
+)
+# Read timeouts in seconds per proxied route
+UI_TIMEOUTS = parse_timeouts(os.getenv('UI_PROXY_TIMEOUTS', ''),
+                             defaults={'annotate': 5, 'pdf': 10, 'skip': 5, 'submit': 5})
+# PDFs are passed through in chunks of this size, the proxy never holds more than one chunk per request
+PDF_CHUNK_SIZE = 64 * 1024
+# Conditional and partial request headers forwarded to the UI for PDFs
+PDF_REQUEST_HEADERS = ('Range', 'If-Range', 'If-None-Match', 'If-Modified-Since')
+# '/api/db-preview': rows per table and JSON page, NDJSON lines are sent in chunks of this many rows
+PREVIEW_MAX_PAGE = 1000
+PREVIEW_CHUNK_ROWS = 200
 
 # Example function choices for the dropdown
 FUNCTION_CHOICES = json.loads(os.getenv('FUNCTION_CHOICES', "[]"))
@@ -44,6 +73,25 @@ def create_app() -> Flask:
     app.secret_key = secret
     flask_log = get_logger(__name__)
 
+    if UI_IN_PROCESS:
+        try:
+            from sop_ui.app import create_app as create_ui_app
+        except ImportError as e:
+            raise RuntimeError('UI_IN_PROCESS is set but the sop_ui package is not installed') from e
+        # The proxy routes below stay registered but are never reached, the middleware answers these paths
+        app.wsgi_app = InProcessUI(mask_app=app.wsgi_app, ui_app=create_ui_app())
+        flask_log.info('UI served in-process')
+
+    # Rendered once, failing fast must not cost a template render per request
+    unavailable_page: list[str] = []
+
+    def ui_unavailable(e: Exception) -> Response:
+        if not unavailable_page:
+            unavailable_page.append(render_template('ui_unavailable.html'))
+        if isinstance(e, CircuitOpenError):
+            return Response(unavailable_page[0], 503, {'Retry-After': str(max(1, round(e.retry_after)))})
+        return Response(unavailable_page[0], 502)
+
     @app.route('/', methods=['GET'])
     def identify_mask():
         return render_template('identify_mask.html')
@@ -143,77 +191,66 @@ def create_app() -> Flask:
         user_pk = request.args.get("user_pk")
         func_pk = request.args.get("func_pk")
 
-        ui_url = f"http://{UI_HOST}:{UI_PORT}/"
-
         params = {}
         if user_pk and func_pk:
             params = {"user_pk": user_pk, "func_pk": func_pk}
 
         try:
-            ui_resp = requests.get(
-                ui_url,
+            ui_resp = ui_client.get(
+                "/",
+                UI_TIMEOUTS['annotate'],
                 params=params or None,
                 cookies=request.cookies,
-                timeout=5,
             )
         except requests.RequestException as e:
             flask_log.error("Error contacting UI service: %s", e)
-            return "UI service unavailable", 502
-
-        excluded_headers = {
-            "content-encoding", "content-length",
-            "transfer-encoding", "connection"
-        }
-        headers = [
-            (name, value)
-            for name, value in ui_resp.headers.items()
-            if name.lower() not in excluded_headers
-        ]
-        return Response(ui_resp.content, ui_resp.status_code, headers)
+            return ui_unavailable(e)
+
+        return Response(ui_resp.content, ui_resp.status_code, filter_headers(ui_resp.headers))
 
     @app.route('/pdf/<path:filename>', methods=['GET'])
     def proxy_pdf(filename):
-        ui_url = f"http://{UI_HOST}:{UI_PORT}/pdf/{filename}"
+        # Byte ranges and revalidation are answered by the UI (206/304), the proxy streams the raw body through
+        headers = {name: request.headers[name] for name in PDF_REQUEST_HEADERS if name in request.headers}
+        headers['Accept-Encoding'] = 'identity'
 
         try:
-            ui_resp = requests.get(
-                ui_url,
+            ui_resp = ui_client.get(
+                f"/pdf/{filename}",
+                UI_TIMEOUTS['pdf'],
                 params=request.args,
                 cookies=request.cookies,
-                timeout=10,
+                headers=headers,
                 stream=True,
+                allow_redirects=False,
             )
         except requests.RequestException as e:
             flask_log.error("Error contacting UI service (pdf): %s", e)
-            return "UI service unavailable", 502
+            return ui_unavailable(e)
 
-        excluded_headers = {
-            "content-encoding", "content-length",
-            "transfer-encoding", "connection"
-        }
-        headers = [
-            (name, value)
-            for name, value in ui_resp.headers.items()
-            if name.lower() not in excluded_headers
-        ]
+        def body():
+            try:
+                yield from ui_resp.raw.stream(PDF_CHUNK_SIZE, decode_content=False)
+            finally:
+                # Also runs if the client disconnects, the connection goes back to the pool
+                ui_resp.close()
 
-        return Response(ui_resp.content, ui_resp.status_code, headers)
+        return Response(body(), ui_resp.status_code, filter_headers(ui_resp.headers, HOP_BY_HOP_HEADERS),
+                        direct_passthrough=True)
 
     @app.route('/skip_question', methods=['GET'])
     def proxy_skip_question():
-        ui_url = f"http://{UI_HOST}:{UI_PORT}/skip_question"
-
         try:
-            ui_resp = requests.get(
-                ui_url,
+            ui_resp = ui_client.get(
+                "/skip_question",
+                UI_TIMEOUTS['skip'],
                 params=request.args,          # question_id wird durchgereicht
                 cookies=request.cookies,
-                timeout=5,
                 allow_redirects=False,
             )
         except requests.RequestException as e:
             flask_log.error("Error contacting UI service (skip): %s", e)
-            return "UI service unavailable", 502
+            return ui_unavailable(e)
 
         # Redirects von UI sauber auf identify mappen
         if ui_resp.status_code in (301, 302, 303, 307, 308):
@@ -222,32 +259,21 @@ def create_app() -> Flask:
                 return redirect(url_for("annotate"))  # UI home entspricht hier annotate
             return redirect(location)
 
-        excluded_headers = {
-            "content-encoding", "content-length",
-            "transfer-encoding", "connection"
-        }
-        headers = [
-            (name, value)
-            for name, value in ui_resp.headers.items()
-            if name.lower() not in excluded_headers
-        ]
-        return Response(ui_resp.content, ui_resp.status_code, headers)
+        return Response(ui_resp.content, ui_resp.status_code, filter_headers(ui_resp.headers))
 
     @app.route('/submit_annotation', methods=['POST'])
     def proxy_submit_annotation():
-        ui_url = f"http://{UI_HOST}:{UI_PORT}/submit_annotation"
-
         try:
-            ui_resp = requests.post(
-                ui_url,
+            ui_resp = ui_client.post(
+                "/submit_annotation",
+                UI_TIMEOUTS['submit'],
                 data=request.form,
                 cookies=request.cookies,
-                timeout=5,
                 allow_redirects=False,
             )
         except requests.RequestException as e:
             flask_log.error("Error contacting UI service (submit): %s", e)
-            return "UI service unavailable", 502
+            return ui_unavailable(e)
 
         # sop_ui answers with redirect to '/'
         if ui_resp.status_code in (301, 302, 303, 307, 308):
@@ -259,30 +285,91 @@ def create_app() -> Flask:
                 # other redirects get passed
                 return redirect(location)
 
-        excluded_headers = {
-            "content-encoding", "content-length",
-            "transfer-encoding", "connection"
-        }
-        headers = [
-            (name, value)
-            for name, value in ui_resp.headers.items()
-            if name.lower() not in excluded_headers
-        ]
-        return Response(ui_resp.content, ui_resp.status_code, headers)
+        return Response(ui_resp.content, ui_resp.status_code, filter_headers(ui_resp.headers))
+
+    @app.get('/healthz')
+    def healthz():
+        """Cheap liveness check: database reachability and the state of the UI backend."""
+        db = db_health(db=db_path, statements=statements)
+        ui = {'in_process': True} if UI_IN_PROCESS else ui_client.breaker.stats()
+        return jsonify({'status': 'ok' if db['ok'] else 'error', 'db': db, 'ui': ui}), 200 if db['ok'] else 503
 
     @app.route("/api/db-preview", methods=["GET"])
     def db_preview():
-        """Preview all DB tables as text, returned as JSON."""
+        """
+        Inspect the DB tables, rows are streamed straight from SQLite in rowid order (keyset pagination).
+
+        Query parameters:
+            format:             'json' (default, one page per table), 'ndjson' (one row per line, streamed)
+                                or 'text' (text preview of all tables written to PREVIEW_DIR, returned as JSON)
+            table:              Tables to read, repeated or comma separated (default: all tables)
+            columns.<table>:    Comma separated columns of a table (default: all columns)
+            after:              Cursor, only rows with a higher rowid ('next_after' of the previous page)
+            limit:              Rows per table (default 100), 'ndjson' streams all rows with 'limit=0'
+        """
         flask_log.info("DB preview requested")
 
         db_file = db_path
-        preview_dir = os.getenv("PREVIEW_DIR")
+        fmt = request.args.get("format", default="json")
         limit = request.args.get("limit", default=100, type=int)
 
         if not db_file:
             flask_log.error("DATA_DIR is not set")
             return jsonify({"error": "DATA_DIR is not set"}), 500
 
+        if fmt == "text":
+            return text_preview(db_file, limit)
+        if fmt not in ("json", "ndjson"):
+            return jsonify({"error": f'Unknown format "{fmt}", use json, ndjson or text'}), 400
+
+        schema = table_columns(db_file)
+        tables = [t for arg in request.args.getlist("table") for t in arg.split(",") if t] or list(schema)
+        after = request.args.get("after", type=int)
+        if after is not None and len(tables) != 1:
+            return jsonify({"error": "'after' needs exactly one table"}), 400
+        if fmt == "json":
+            limit = max(1, min(limit, PREVIEW_MAX_PAGE))
+        elif limit <= 0:
+            limit = None
+
+        # Unknown tables and columns are rejected before the first row is sent
+        try:
+            readers = {}
+            for t in tables:
+                columns = request.args.get(f"columns.{t}")
+                columns = [c for c in columns.split(",") if c] if columns else None
+                # One row more than the page tells whether there is a next page
+                readers[t] = (columns or schema.get(t, []),
+                              iter_table_rows(db_file, t, columns=columns, after=after,
+                                              limit=limit + 1 if fmt == "json" else limit))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if fmt == "json":
+            result = {}
+            for t, (columns, rows) in readers.items():
+                page = list(rows)
+                more = len(page) > limit
+                page = page[:limit]
+                result[t] = {"columns": columns, "rows": [row for _, row in page],
+                             "next_after": page[-1][0] if more else None}
+            return jsonify({"tables": result})
+
+        def ndjson():
+            lines = []
+            for t, (_, rows) in readers.items():
+                for rowid, row in rows:
+                    lines.append(json.dumps({"table": t, "rowid": rowid, "row": row}, ensure_ascii=False))
+                    if len(lines) >= PREVIEW_CHUNK_ROWS:
+                        yield "\n".join(lines) + "\n"
+                        lines = []
+            if lines:
+                yield "\n".join(lines) + "\n"
+
+        return Response(ndjson(), mimetype="application/x-ndjson")
+
+    def text_preview(db_file: str, limit: int):
+        preview_dir = os.getenv("PREVIEW_DIR")
         if not preview_dir:
             flask_log.error("PREVIEW_DIR is not set")
             return jsonify({"error": "PREVIEW_DIR is not set"}), 500
@@ -0,0 +1,125 @@
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable
+
+import requests
+
+log = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """
+    Raised instead of calling the UI while the circuit is open. Subclass of 'requests.ConnectionError', so
+    the proxy routes handle it like any other failed call.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(f'UI circuit open, retry in {retry_after:.0f}s')
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker over the calls of the user mask to the UI service.
+
+    The outcome of the last 'window' calls is kept: a call fails if it raised, returned a 5xx status or took
+    longer than 'slow_call' seconds. Once at least 'min_calls' calls are recorded and the share of failed
+    calls reaches 'failure_rate', the circuit opens and 'before_call' raises 'CircuitOpenError' right away
+    instead of letting every request wait for the timeout.
+
+    While the circuit is open a background thread probes the UI with 'probe' every 'open_seconds' (half-open
+    state), user requests never serve as probes. The first successful probe closes the circuit and clears the
+    window.
+
+    Args:
+        probe (Callable[[], bool]):     Cheap health check of the UI, 'True' if it is usable again.
+        window (int):                   Number of recent calls the failure rate is computed over.
+        min_calls (int):                Calls needed in the window before the circuit can open.
+        failure_rate (float):           Share of failed calls that opens the circuit.
+        slow_call (float):              Seconds after which a successful call still counts as failed.
+        open_seconds (float):           Seconds between probes while the circuit is open.
+    """
+
+    def __init__(self, probe: Callable[[], bool], window: int = 20, min_calls: int = 5, failure_rate: float = 0.5,
+                 slow_call: float = 2.0, open_seconds: float = 10.0):
+        self.probe = probe
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.open_seconds = open_seconds
+        self._calls: deque[tuple[bool, float]] = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def before_call(self) -> None:
+        """
+        Raises:
+            CircuitOpenError: If the circuit is open or half-open.
+        """
+
+        if self._state != CLOSED:
+            raise CircuitOpenError(retry_after=self.retry_after())
+
+    def record(self, ok: bool, seconds: float) -> None:
+        """
+        Record the outcome and duration of a call made while the circuit was closed.
+        """
+
+        failed = not ok or seconds > self.slow_call
+        with self._lock:
+            if self._state != CLOSED:
+                return
+            self._calls.append((failed, seconds))
+            failures = sum(f for f, _ in self._calls)
+            if len(self._calls) >= self.min_calls and failures >= self.failure_rate * len(self._calls):
+                self._open(failures)
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic()) if self._state != CLOSED else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = list(self._calls)
+        latencies = sorted(seconds for _, seconds in calls)
+        return {
+            'state': self._state,
+            'calls': len(calls),
+            'failures': sum(f for f, _ in calls),
+            'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+            'max_ms': round(latencies[-1] * 1000, 1) if latencies else None,
+        }
+
+    def _open(self, failures: int) -> None:
+        # Called with the lock held
+        log.warning('UI circuit opened: %s of the last %s calls failed', failures, len(self._calls))
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        threading.Thread(target=self._probe_loop, name='ui-circuit-probe', daemon=True).start()
+
+    def _probe_loop(self) -> None:
+        while True:
+            time.sleep(self.open_seconds)
+            self._state = HALF_OPEN
+            try:
+                healthy = self.probe()
+            except Exception:
+                healthy = False
+
+            with self._lock:
+                if healthy:
+                    self._state = CLOSED
+                    self._calls.clear()
+                    log.warning('UI circuit closed, probe succeeded')
+                    return
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+            log.info('UI still unavailable, next probe in %ss', self.open_seconds)
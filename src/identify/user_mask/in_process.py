@@ -0,0 +1,42 @@
+from typing import Callable, Iterable
+
+# Paths of the user mask that are served by the UI, '/annotate' is the UI home page
+UI_PATHS = ('/annotate', '/skip_question', '/submit_annotation')
+UI_PREFIXES = ('/pdf/',)
+UI_HOME = '/annotate'
+
+
+class InProcessUI:
+    """
+    WSGI middleware that serves the proxied routes with the UI app in the same process.
+
+    Requests for '/annotate', '/pdf/<file>', '/skip_question' and '/submit_annotation' are passed to the
+    UI app directly instead of through 'UIClient', everything else goes to the user mask. The URLs stay the
+    same as behind the proxy: '/annotate' is the UI home page '/', and a redirect of the UI to '/' is
+    answered with a redirect to '/annotate'. Cookies, sessions and the request body are not copied, the UI
+    reads the original request and writes its response (streamed PDFs included) straight to the client.
+
+    Args:
+        mask_app (Callable):    WSGI app of the user mask ('app.wsgi_app').
+        ui_app (Callable):      WSGI app of the UI, e.g. 'sop_ui.app.create_app()'.
+    """
+
+    def __init__(self, mask_app: Callable, ui_app: Callable):
+        self.mask_app = mask_app
+        self.ui_app = ui_app
+
+    def __call__(self, environ: dict, start_response: Callable) -> Iterable[bytes]:
+        path = environ.get('PATH_INFO', '')
+        if path not in UI_PATHS and not path.startswith(UI_PREFIXES):
+            return self.mask_app(environ, start_response)
+
+        if path == UI_HOME:
+            environ = {**environ, 'PATH_INFO': '/'}
+
+        def ui_start_response(status, headers, exc_info=None):
+            # Same mapping as the proxy routes: the UI home page is '/annotate' here
+            headers = [(name, UI_HOME if name.lower() == 'location' and value == '/' else value)
+                       for name, value in headers]
+            return start_response(status, headers, exc_info)
+
+        return self.ui_app(environ, ui_start_response)
@@ -0,0 +1,127 @@
+import json
+import time
+import http.cookiejar
+from typing import Mapping
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .circuit_breaker import CircuitBreaker
+
+# Headers that only apply to one connection, never passed on by the proxy
+HOP_BY_HOP_HEADERS = frozenset({'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te',
+                                'trailer', 'transfer-encoding', 'upgrade'})
+# Headers of a UI response that must not be copied into a proxied response built from the decoded content
+EXCLUDED_HEADERS = frozenset({'content-encoding', 'content-length', 'transfer-encoding', 'connection'})
+
+
+def filter_headers(headers: Mapping[str, str], excluded: frozenset[str] = EXCLUDED_HEADERS) -> list[tuple[str, str]]:
+    """
+    Headers of a UI response that can be passed on to the client unchanged.
+
+    Args:
+        headers (Mapping[str, str]):    Response headers of the UI.
+        excluded (frozenset[str]):      Lowercase names to drop. 'HOP_BY_HOP_HEADERS' for raw passthrough,
+                                        where 'Content-Length' and 'Content-Encoding' still match the body.
+    """
+
+    return [(name, value) for name, value in headers.items() if name.lower() not in excluded]
+
+
+class _NoCookies(http.cookiejar.DefaultCookiePolicy):
+    # The session is shared by all users, cookies are passed per request and must never be stored
+    def set_ok(self, cookie, request):
+        return False
+
+    def return_ok(self, cookie, request):
+        return False
+
+
+class UIClient:
+    """
+    Pooled keep-alive HTTP client for the sop_ui service.
+
+    One 'requests.Session' is shared by all request threads, its connection pool keeps up to 'pool_size'
+    connections to the UI open, so a proxied request reuses a connection instead of opening a new one.
+    The session never stores cookies, the cookies of the current user are passed with every request.
+
+    Every request goes through a 'CircuitBreaker': while the UI keeps failing or answering slowly, requests
+    fail immediately with 'CircuitOpenError' and the UI's '/healthz' is probed in the background instead.
+
+    Args:
+        host (str):                 Host name of the UI service.
+        port (str | int):           Port of the UI service.
+        pool_size (int):            Connections kept open, should match the number of request threads.
+        connect_timeout (float):    Seconds to wait for a new connection, the read timeout is set per request.
+        breaker (dict | None):      Keyword arguments for the 'CircuitBreaker', defaults if 'None'.
+    """
+
+    def __init__(self, host: str, port: str | int, pool_size: int = 10, connect_timeout: float = 2.0,
+                 breaker: dict | None = None):
+        self.base_url = f'http://{host}:{port}'
+        self.connect_timeout = connect_timeout
+        self.breaker = CircuitBreaker(probe=self.healthy, **(breaker or {}))
+        self.session = requests.Session()
+        self.session.cookies.set_policy(_NoCookies())
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+
+    def request(self, method: str, path: str, read_timeout: float, **kwargs) -> requests.Response:
+        """
+        Send a request to the UI. 'kwargs' are passed to 'requests.Session.request'.
+
+        Raises:
+            requests.RequestException: If the UI cannot be reached or does not answer in time,
+                                       'CircuitOpenError' without calling the UI while the circuit is open.
+        """
+
+        self.breaker.before_call()
+        start = time.perf_counter()
+        try:
+            resp = self.session.request(method, self.base_url + path, timeout=(self.connect_timeout, read_timeout),
+                                        **kwargs)
+        except requests.RequestException:
+            self.breaker.record(ok=False, seconds=time.perf_counter() - start)
+            raise
+        # For streamed responses this is the time until the headers arrived
+        self.breaker.record(ok=resp.status_code < 500, seconds=time.perf_counter() - start)
+        return resp
+
+    def get(self, path: str, read_timeout: float, **kwargs) -> requests.Response:
+        return self.request('GET', path, read_timeout, **kwargs)
+
+    def post(self, path: str, read_timeout: float, **kwargs) -> requests.Response:
+        return self.request('POST', path, read_timeout, **kwargs)
+
+    def healthy(self) -> bool:
+        """
+        Probe the UI's '/healthz' directly (not through the circuit breaker).
+        """
+
+        try:
+            resp = self.session.get(self.base_url + '/healthz', timeout=(self.connect_timeout, 2.0))
+        except requests.RequestException:
+            return False
+        return resp.ok
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def parse_timeouts(raw: str, defaults: Mapping[str, float]) -> dict[str, float]:
+    """
+    Per-route read timeouts: the defaults, overridden by a JSON object such as '{"pdf": 30}'.
+
+    Raises:
+        ValueError: If 'raw' is no JSON object or names an unknown route.
+    """
+
+    timeouts = dict(defaults)
+    overrides = json.loads(raw) if raw.strip() else {}
+    if not isinstance(overrides, dict):
+        raise ValueError(f'UI_PROXY_TIMEOUTS must be a JSON object, got: {raw}')
+    unknown = set(overrides) - set(defaults)
+    if unknown:
+        raise ValueError(f'Unknown routes in UI_PROXY_TIMEOUTS: {", ".join(sorted(unknown))}')
+    timeouts.update({route: float(value) for route, value in overrides.items()})
+    return timeouts
@@ -1,84 +1,96 @@
 import os
-import json
-import re
+import time
+import tempfile
 
 from pathlib import Path
-from flask import Flask, render_template, request, redirect, url_for, session, send_from_directory, abort
+from flask import Flask, render_template, request, redirect, url_for, session, send_file, abort, jsonify, Response
 
-from utils import setup_logging, get_logger, __load_env, sampling, db_push, load_yaml, append_alternative_question_to_json
+from utils import setup_logging, get_logger, __load_env, sampling, db_push, load_yaml, \
+    release_lease, claim_question, prefetch_candidates, held_question, get_skipped_questions, add_skipped_question, \
+    clear_skipped_questions, db_health, submission_settled, AnnotationWriteBehind
+from .prefetch import PrefetchQueue
+from .question_bank import QuestionBank, QuestionEntry
+from .pdf_manifest import PdfManifest
+from .page_cache import PageCache
+from .bank_validation import BankValidator
 
 # Setup
 cwd = Path(__file__).resolve()
 loaded_from = __load_env(cwd=cwd)
 log_loc = get_logger(__name__)
 statements = load_yaml()
-q_bank_path = Path(os.getenv('DATA_DIR_QUESTIONS')).resolve()
-q_bank = None
 db_path = os.getenv('DATA_DIR')
 pdf_dir = Path(os.getenv('FILE_DIR', '/docs/pdfs')).resolve()
-
-
-def load_q_bank(force_reload: bool = False):
-    global q_bank
-    if q_bank is None or force_reload:
-        with open(q_bank_path, 'r', encoding='utf-8') as file:
-            q_bank = json.load(file)
-    return q_bank
-
-def normalize_file_and_page(file_name: str, page: str) -> tuple[str, int]:
-    """
-    Converts "...._textOnlyV2.docx" ---> "....._original.pdf" as well as "page number" ---> int(number)
-
-    Args:
-        file_name (str): Filename from the Json questions database where the context comes from for the question.
-        page (str): Note of the page where the context comes from
-
-    Return:
-        (normalized_file_name: str, page_number: int)
-    """
-
-    if file_name.endswith('_textOnlyV2.docx'):
-        file_name = file_name.replace('_textOnlyV2.docx', "_original.pdf")
-
-    match = re.search(r"\d+", page)
-    if not match:
-        raise RuntimeError(f"Invalid page format: {page}")
-
-    page_number = int(match.group())
-
-    return file_name, page_number
-
-def get_next_example_from_db(usr_pk: int, fun_pk: int) -> tuple[int, str, str, str, int]:
+pdf_manifest = PdfManifest(pdf_dir, refresh_interval=float(os.getenv('PDF_MANIFEST_REFRESH', '60')))
+# PDF URLs carry the content version ('?v='), such a URL never changes its content and is cached for a year.
+# Requests without (or with an outdated) version are revalidated, which costs a 304 without a file read.
+PDF_CACHE_IMMUTABLE = 'public, max-age=31536000, immutable'
+PDF_CACHE_REVALIDATE = 'no-cache'
+# The annotation view embeds only the referenced page, cut out once and kept in a bounded disk cache
+page_cache = PageCache(
+    manifest=pdf_manifest,
+    cache_dir=Path(os.getenv('PDF_PAGE_CACHE_DIR', Path(tempfile.gettempdir()) / 'sop_pdf_pages')),
+    max_bytes=int(float(os.getenv('PDF_PAGE_CACHE_MB', '256')) * 1024 * 1024)
+)
+write_behind: AnnotationWriteBehind | None = None
+bank = QuestionBank(
+    db=db_path,
+    statements=statements,
+    duplicates=os.getenv('NEAR_DUPLICATE_MODE', 'merge'),
+    threshold=float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.8'))
+)
+# Questions whose PDF is missing or whose page is invalid are excluded from sampling (checked at startup)
+unservable_report = os.getenv('UNSERVABLE_QUESTIONS_REPORT')
+validator = BankValidator(bank, pdf_manifest, report=Path(unservable_report) if unservable_report else None)
+prefetch = PrefetchQueue(
+    fill=lambda usr_pk, fun_pk, k, exclude: prefetch_candidates(statements=statements, usr_id=usr_pk, fun_id=fun_pk,
+                                                                k=k, exclude=exclude),
+    claim=lambda q_id, usr_pk, fun_pk: claim_question(statements=statements, q_id=q_id, usr_id=usr_pk, fun_id=fun_pk),
+    depth=int(os.getenv('PREFETCH_DEPTH', '8')),
+    idle_ttl=float(os.getenv('PREFETCH_IDLE_TTL', '1800'))
+)
+
+
+def get_next_example_from_db(usr_pk: int, fun_pk: int, skipped: set[int] | None = None,
+                             pending: set[int] | None = None) -> tuple[int, str, str, str, int]:
     """
     This function retrieves next question (make sure every question only 2 annotators use predefined function)
 
+    A question still leased to the user is served first, then the prefetched candidates of the session.
+    The full sampler only runs if the prefetch buffer is empty. Skipped questions are only returned
+    if nothing else is left. Questions that cannot be served (see 'validator') and the user's submissions
+    that are not written yet ('pending') are never returned.
+
     Returns:
          (question_id, question_text, answer_text, pdf file name, page for passage)
     """
 
-    json_file = load_q_bank()
-    question = sampling(statements=statements, j_file=json_file, usr_id=usr_pk, fun_id=fun_pk)
+    pending = pending or set()
+    exclude = (skipped or set()) | validator.invalid_ids | pending
+    question = held_question(statements=statements, usr_id=usr_pk, fun_id=fun_pk, exclude=exclude) \
+        or prefetch.pop(usr_pk, fun_pk, exclude=exclude) \
+        or sampling(statements=statements, usr_id=usr_pk, fun_id=fun_pk, exclude=skipped, pending=pending)
     log_loc.info(f"{question['q_id']}, {question['question']}, {question['answer']}")
-    file_name, page_number = normalize_file_and_page(question['file_name'], question['page'])
 
-    return question['q_id'], question['question'], question['answer'], file_name, page_number
+    return get_example_by_id(question['q_id'])
 
 def get_example_by_id(q_id: int) -> tuple[int, str, str, str, int]:
     """
+    Look up a question of the question bank by id (dictionary lookup in the in-memory 'bank').
 
-    :param q_id:
-    :return:
+    Returns:
+         (question_id, question_text, answer_text, pdf file name, page for passage)
     """
 
-    data = load_q_bank()
-    if not isinstance(data, list):
-        raise RuntimeError('Question bank must be a list of objects')
+    entry = bank.get(q_id)
+    if entry is None:
+        raise RuntimeError(f"No question found with q_id={q_id}")
+    return _example(entry)
 
-    for q in data:
-        if q.get('q_id') == q_id:
-            file_name, file_page = normalize_file_and_page(q['file_name'], q['page'])
-            return q["q_id"], q["question"], q["answer"], file_name, file_page
-    raise RuntimeError(f"No question found with q_id={q_id}")
+def _example(entry: QuestionEntry) -> tuple[int, str, str, str, int]:
+    if entry.pdf_file is None:
+        raise RuntimeError(f"Invalid file or page for q_id={entry.q_id}")
+    return entry.q_id, entry.question, entry.answer, entry.pdf_file, entry.page_number
 
 
 def save_annotation_to_db(qstn: str, q_id: int,  alt_q: str | None, f_name: str, f_page: int, ansr: str, alt_a: str | None,
@@ -86,6 +98,7 @@ def save_annotation_to_db(qstn: str, q_id: int,  alt_q: str | None, f_name: str,
     """
     Takes Userinterface inputs which describe the answer to the question like how fluent, comprehensive and factual
     the answer is. It is called from the Flask app posting to the /submit_annotation.
+    In write-behind mode ('$ANNOTATION_JOURNAL_DIR' set) the row is only journaled and written in the background.
 
     Args:
         qstn (str): Question text in the Question Bank going to be rated.
@@ -107,6 +120,9 @@ def save_annotation_to_db(qstn: str, q_id: int,  alt_q: str | None, f_name: str,
     """
     a_data = [(qstn, q_id, alt_q, f_name, f_page, ansr, alt_a, q_acc,
                clear, relev, cotxt, flu, comp, fact, ann_id)]
+    if write_behind is not None:
+        write_behind.submit(a_data[0])
+        return
     db_push(data=a_data, db=db_path, table='annotations', statements=statements)
 
 def save_alternative_to_question_bank(
@@ -117,11 +133,10 @@ def save_alternative_to_question_bank(
     flask_log
 ) -> int | None:
     """
-    Add alternative question and answer to the JSON question bank only if both are present.
-    Reload the in memory cache afterwards so the new entry can be sampled immediately.
+    Add alternative question and answer to the question bank only if both are present.
+    The new entry can be sampled immediately by every worker process.
     """
-    new_q_id = append_alternative_question_to_json(
-        json_path=q_bank_path,
+    new_q_id = bank.append_alternative(
         alt_question=alt_question,
         alt_answer=alt_answer,
         file_name=file_name,
@@ -129,8 +144,7 @@ def save_alternative_to_question_bank(
     )
 
     if new_q_id is not None:
-        load_q_bank(force_reload=True)
-        flask_log.info("Added alternative QA to JSON with q_id=%s", new_q_id)
+        flask_log.info("Added alternative QA to the question bank with q_id=%s", new_q_id)
 
     return new_q_id
 
@@ -157,21 +171,104 @@ def create_app() -> Flask:
     app.secret_key = secret
     flask_log = get_logger(__name__)
 
+    global write_behind
+    journal_dir = os.getenv('ANNOTATION_JOURNAL_DIR')
+    if journal_dir and write_behind is None:
+        write_behind = AnnotationWriteBehind(
+            journal_dir=journal_dir,
+            db=db_path,
+            statements=statements,
+            batch_size=int(os.getenv('WRITE_BEHIND_BATCH', '200')),
+            flush_interval=float(os.getenv('WRITE_BEHIND_INTERVAL', '0.5'))
+        )
+        flask_log.info("Write-behind annotation journal in %s", journal_dir)
+
+    # Hash all PDFs once at startup, requests only look them up
+    pdf_manifest.refresh()
+    flask_log.info("PDF manifest: %s files in %s", len(pdf_manifest), pdf_dir)
+    unservable = validator.validate()
+    flask_log.info("Question bank validated: %s of %s questions excluded from sampling", unservable, len(bank))
+    page_cache.warm(bank.pages)
+
+    def finish_submission(user_pk: int, question_id: int) -> None:
+        func_pk = session.get("func_pk")
+        if write_behind is None:
+            release_lease(statements=statements, q_id=question_id, usr_id=user_pk)
+        else:
+            # The writer releases the lease once the annotation is in the database,
+            # until then the question must not be served to this user again (by any worker)
+            session["pending_question_ids"] = sorted(pending_submissions(user_pk) | {question_id})
+        prefetch.schedule_refill(user_pk, func_pk)
+        clear_skipped_questions(statements=statements, usr_id=user_pk, fun_id=func_pk)
+
+    def pending_submissions(user_pk: int) -> set[int]:
+        # Submitted question ids of the user whose annotation is not settled in the database yet. The
+        # database is asked, the row may be queued in the write-behind journal of another worker.
+        pending = {q_id for q_id in session.get("pending_question_ids", ())
+                   if not submission_settled(statements=statements, q_id=q_id, usr_id=user_pk)}
+        if pending:
+            session["pending_question_ids"] = sorted(pending)
+        else:
+            session.pop("pending_question_ids", None)
+        return pending
+
+    def settle_submissions(user_pk: int) -> bool:
+        # Wait until the pending submissions are written, each writer flushes every 'flush_interval' seconds
+        write_behind.flush()
+        deadline = time.monotonic() + 2 * write_behind.flush_interval + 1
+        while pending_submissions(user_pk):
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    @app.before_request
+    def refresh_question_bank():
+        # One generation lookup per request, only questions changed by other workers are read again
+        if request.endpoint not in ('static', 'serve_pdf', 'healthz'):
+            bank.refresh()
+
+    @app.get('/healthz')
+    def healthz():
+        """Cheap health check: database reachability and load state of the question bank (never loads it)."""
+        db = db_health(db=db_path, statements=statements)
+        questions = {'loaded': bank.loaded, 'entries': len(bank) if bank.loaded else None,
+                     'generation': bank.generation, 'excluded': len(validator.invalid_ids)}
+        return jsonify({'status': 'ok' if db['ok'] else 'error', 'db': db, 'question_bank': questions}), \
+            200 if db['ok'] else 503
+
     @app.get('/pdf/<path:filename>')
     def serve_pdf(filename):
-        pdf_path = (pdf_dir / filename).resolve()
-        flask_log.info("serve_pdf called with filename=%s", filename)
-        flask_log.info("Resolved path=%s", pdf_path)
-
-        if not pdf_path.exists():
-            flask_log.error("PDF not found: %s", pdf_path)
+        info = pdf_manifest.get(filename)
+        if info is None:
+            flask_log.error("PDF not found: %s", filename)
             abort(404)
 
-        if pdf_dir not in pdf_path.parents and pdf_path != pdf_dir:
-            flask_log.error("Invalid PDF path access: %s", pdf_path)
-            abort(403)
-
-        return send_from_directory(pdf_dir, filename)
+        cache_control = PDF_CACHE_IMMUTABLE if request.args.get('v') == info.etag[:16] else PDF_CACHE_REVALIDATE
+        page = request.args.get('page', type=int)
+        etag = info.etag if page is None else f'{info.etag[:32]}-p{page}'
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers={'ETag': f'"{etag}"', 'Cache-Control': cache_control})
+
+        path = info.path
+        if page is not None:
+            path = page_cache.get(filename, page)
+            if path is None:
+                # Page could not be extracted, show the whole PDF at that page instead
+                return redirect(url_for('serve_pdf', filename=filename, v=request.args.get('v'),
+                                        _anchor=f'page={page}'))
+
+        # Range requests are answered with 206 and 'Accept-Ranges: bytes', so PDF viewers only fetch what they need
+        try:
+            resp = send_file(path, mimetype='application/pdf', conditional=True, etag=etag,
+                             last_modified=info.mtime_ns / 1e9)
+        except FileNotFoundError:
+            # Removed since the lookup (page evicted by another worker or PDF deleted), the open file is safe
+            if page is None:
+                abort(404)
+            return redirect(url_for('serve_pdf', filename=filename, v=request.args.get('v'), _anchor=f'page={page}'))
+        resp.headers['Cache-Control'] = cache_control
+        return resp
 
     @app.get('/')
     def home():
@@ -200,24 +297,29 @@ def create_app() -> Flask:
 
         flask_log.info("New question loaded for user_pk=%s func_pk=%s", user_pk, func_pk)
 
-        skipped = set(session.get("skipped_question_ids", []))
+        skipped = get_skipped_questions(statements=statements, usr_id=user_pk, fun_id=func_pk)
+        pending = pending_submissions(user_pk)
 
         try:
-            # Try a few times to avoid immediately repeating a skipped question
-            for _ in range(15):
+            try:
                 question_id, question_text, answer_text, file_name, file_page = get_next_example_from_db(
                     usr_pk=user_pk,
-                    fun_pk=func_pk
+                    fun_pk=func_pk,
+                    skipped=skipped,
+                    pending=pending
                 )
-                if question_id not in skipped:
-                    break
-            else:
-                # If we only find skipped ones, clear skip list and take whatever we get next
-                session["skipped_question_ids"] = []
+            except RuntimeError:
+                # Only the just submitted (still queued) questions may be left, sample again once they are written
+                if not pending or not settle_submissions(user_pk):
+                    raise
                 question_id, question_text, answer_text, file_name, file_page = get_next_example_from_db(
                     usr_pk=user_pk,
-                    fun_pk=func_pk
+                    fun_pk=func_pk,
+                    skipped=skipped
                 )
+            if question_id in skipped:
+                # Only skipped questions are left, start over with an empty skip list
+                clear_skipped_questions(statements=statements, usr_id=user_pk, fun_id=func_pk)
 
         except RuntimeError as e:
             flask_log.info("No more questions for this user/function: %s", e)
@@ -226,7 +328,8 @@ def create_app() -> Flask:
         flask_log.info("PDF for template: file_name=%s, file_page=%s", file_name, file_page)
         return render_template('index.html', no_questions=False,
                                question_id=question_id, question_text=question_text.strip(),
-                               answer_text=answer_text.strip(), file_name=file_name, file_page=file_page)
+                               answer_text=answer_text.strip(), file_name=file_name, file_page=file_page,
+                               file_version=pdf_manifest.version(file_name))
 
     @app.get('/skip_question')
     def skip_question():
@@ -239,10 +342,8 @@ def create_app() -> Flask:
 
         qid = request.args.get('question_id', type=int)
         if qid is not None:
-            skipped = session.get('skipped_question_ids', [])
-            if qid not in skipped:
-                skipped.append(qid)
-            session['skipped_question_ids'] = skipped
+            release_lease(statements=statements, q_id=qid, usr_id=user_pk)
+            add_skipped_question(statements=statements, usr_id=user_pk, fun_id=func_pk, q_id=qid)
 
         return redirect(url_for('home'))
 
@@ -303,7 +404,7 @@ def create_app() -> Flask:
                 flask_log.exception("Failed to save non relevant annotation for question_id=%s", question_id)
                 return "Could not save annotation", 500
 
-            session.pop("skipped_question_ids", None)
+            finish_submission(user_pk=user_pk, question_id=question_id)
             return redirect(url_for('home'))
 
         if initial_relevance == 'yes':
@@ -352,7 +453,7 @@ def create_app() -> Flask:
                 q_acc=True
             )
 
-            session.pop("skipped_question_ids", None)
+            finish_submission(user_pk=user_pk, question_id=question_id)
             return redirect(url_for('home'))
 
         return "Initial relevance missing", 400
@@ -0,0 +1,122 @@
+import os
+import csv
+import logging
+import threading
+from pathlib import Path
+from typing import Iterable
+
+from utils import exclude_from_sampling
+from .pdf_manifest import PdfManifest
+from .question_bank import QuestionBank
+
+log = logging.getLogger(__name__)
+
+
+class BankValidator:
+    """
+    Links the question bank entries to the PDFs in the manifest and keeps unservable questions out of sampling.
+
+    An entry is unservable if its page has no page number ('normalize_file_and_page' failed, 'pdf_file' is
+    'None') or its normalized PDF is not in the 'PdfManifest'. The first 'validate' checks the whole bank,
+    afterwards 'update' (subscribed to the bank) only checks the changed ids. If the set of PDFs changes,
+    the next call checks the whole bank again. Every change of the unservable set is passed to
+    'exclude_from_sampling' and logged, with 'report' the full list is also written to a CSV file.
+
+    Args:
+        bank (QuestionBank):        Question bank of this process.
+        manifest (PdfManifest):     Manifest of the served PDFs.
+        report (Path | None):       CSV file listing the unservable questions, rewritten on every change.
+    """
+
+    def __init__(self, bank: QuestionBank, manifest: PdfManifest, report: Path | None = None):
+        self.bank = bank
+        self.manifest = manifest
+        self.report = report
+        self._invalid: dict[int, str] = {}
+        self._manifest_files: frozenset[str] | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def invalid_ids(self) -> set[int]:
+        return set(self._invalid)
+
+    def reasons(self) -> dict[int, str]:
+        return dict(self._invalid)
+
+    def validate(self) -> int:
+        """
+        Check every entry of the question bank (loads it if needed).
+
+        Returns:
+            int: Number of unservable questions.
+        """
+
+        self.bank.subscribe(self.update)
+        # Load the bank before taking the lock, the initial load notifies 'update'
+        entries = self.bank.entries()
+        with self._lock:
+            self._manifest_files = self.manifest.names()
+            invalid = {}
+            for entry in entries:
+                reason = self._check(entry)
+                if reason:
+                    invalid[entry.q_id] = reason
+            self._apply(invalid)
+        return len(self._invalid)
+
+    def update(self, q_ids: Iterable[int]) -> None:
+        """
+        Check the given (added, changed or removed) questions again.
+        """
+
+        if self._manifest_files is None:
+            return
+        if self.manifest.names() != self._manifest_files:
+            self.validate()
+            return
+
+        with self._lock:
+            invalid = dict(self._invalid)
+            for q_id in q_ids:
+                entry = self.bank.cached(q_id)
+                reason = self._check(entry) if entry is not None else None
+                if reason:
+                    invalid[q_id] = reason
+                else:
+                    invalid.pop(q_id, None)
+            self._apply(invalid)
+
+    def _check(self, entry) -> str | None:
+        if entry.pdf_file is None:
+            return 'invalid file_name or page'
+        if self.manifest.get(entry.pdf_file) is None:
+            return f'PDF not found: {entry.pdf_file}'
+        return None
+
+    def _apply(self, invalid: dict[int, str]) -> None:
+        # Called with the lock held, 'exclude_from_sampling' only applies the difference
+        added = invalid.keys() - self._invalid.keys()
+        fixed = self._invalid.keys() - invalid.keys()
+        self._invalid = invalid
+        exclude_from_sampling(invalid)
+
+        for q_id in sorted(added):
+            log.warning('Question %s excluded from sampling: %s', q_id, invalid[q_id])
+        for q_id in sorted(fixed):
+            log.info('Question %s can be served again', q_id)
+        if added or fixed:
+            log.info('%s questions excluded from sampling', len(invalid))
+            self._write_report()
+
+    def _write_report(self) -> None:
+        if self.report is None:
+            return
+        tmp = self.report.with_name(f'.{self.report.name}.{os.getpid()}.tmp')
+        try:
+            with tmp.open('w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(('q_id', 'reason'))
+                writer.writerows(sorted(self._invalid.items()))
+            tmp.replace(self.report)
+        except OSError as e:
+            log.error('Could not write the question report %s: %s', self.report, e)
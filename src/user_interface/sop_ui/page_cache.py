@@ -0,0 +1,162 @@
+import os
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Iterable
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.errors import PdfReadError
+
+from .pdf_manifest import PdfManifest
+
+log = logging.getLogger(__name__)
+
+
+class PageCache:
+    """
+    Bounded on-disk LRU cache of single pages cut out of the SOP PDFs.
+
+    A page is extracted once per '(file, page)' into a small standalone PDF named after the content hash of
+    its source ('<hash>-p<page>.pdf'), so a changed PDF never serves stale pages. Hits refresh the file mtime,
+    which is the LRU order; once the cache grows beyond 'max_bytes' the least recently used pages are deleted.
+    The directory can be shared by all worker processes, files are written to a temp file and renamed.
+
+    Args:
+        manifest (PdfManifest):     Manifest of the source PDFs.
+        cache_dir (Path):           Directory of the extracted pages, created if missing.
+        max_bytes (int):            Size limit of the cache directory.
+    """
+
+    def __init__(self, manifest: PdfManifest, cache_dir: Path, max_bytes: int = 256 * 1024 * 1024):
+        self.manifest = manifest
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._size: int | None = None
+        self._lock = threading.Lock()
+        self._extracting: dict[str, threading.Lock] = {}
+        # Pages that could not be extracted (per content hash), not tried again by this process
+        self._failed: set[str] = set()
+
+    def get(self, filename: str, page: int) -> Path | None:
+        """
+        Return the cached single-page PDF of page 'page' (1-based), extracting it on a miss.
+
+        Returns:
+            Path | None: Path of the page PDF, 'None' if the file is unknown, the page does not exist or the
+                         PDF cannot be read (callers fall back to the whole PDF). Another worker may evict the
+                         page before it is opened, callers handle 'FileNotFoundError' the same way.
+        """
+
+        info = self.manifest.get(filename)
+        if info is None or page < 1:
+            return None
+
+        path = self.cache_dir / f'{info.etag[:32]}-p{page}.pdf'
+        if path.name in self._failed:
+            return None
+        try:
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+
+        with self._lock:
+            key_lock = self._extracting.setdefault(path.name, threading.Lock())
+        try:
+            with key_lock:
+                # Another thread may have extracted the page in the meantime
+                if not path.exists() and not self._extract(info.path, page, path):
+                    self._failed.add(path.name)
+                    return None
+        finally:
+            with self._lock:
+                self._extracting.pop(path.name, None)
+        return path
+
+    def warm(self, pages: Callable[[], Iterable[tuple[str, int]]]) -> threading.Thread:
+        """
+        Extract the given pages in a background thread, most useful with the pages the question bank references.
+        Warming stops once the cache is 90 % full, so it never evicts pages itself.
+
+        Args:
+            pages (Callable):   Returns the '(file name, page)' pairs, called in the background thread.
+        """
+
+        def run():
+            warmed = 0
+            try:
+                for filename, page in sorted(set(pages())):
+                    if self._total_size() >= 0.9 * self.max_bytes:
+                        log.info('Page cache full, warming stopped')
+                        break
+                    if self.get(filename, page) is not None:
+                        warmed += 1
+            except Exception:
+                log.exception('Warming the page cache failed')
+            log.info('Page cache warmed: %s pages in %s', warmed, self.cache_dir)
+
+        thread = threading.Thread(target=run, name='pdf-page-cache-warm', daemon=True)
+        thread.start()
+        return thread
+
+    def _extract(self, source: Path, page: int, target: Path) -> bool:
+        try:
+            reader = PdfReader(source)
+            if page > len(reader.pages):
+                log.warning('%s has no page %s (%s pages)', source.name, page, len(reader.pages))
+                return False
+            writer = PdfWriter()
+            writer.add_page(reader.pages[page - 1])
+
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_name(f'.{target.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+            with tmp.open('wb') as f:
+                writer.write(f)
+            os.replace(tmp, target)
+        except (PdfReadError, OSError, ValueError) as e:
+            log.warning('Could not extract page %s of %s: %s', page, source.name, e)
+            return False
+
+        size = target.stat().st_size
+        with self._lock:
+            self._size = self._total_size() + size
+            over = self._size > self.max_bytes
+        if over:
+            self._evict()
+        return True
+
+    def _total_size(self) -> int:
+        if self._size is None:
+            self._size = sum(entry.stat().st_size for entry in self._entries())
+        return self._size
+
+    def _entries(self) -> list[os.DirEntry]:
+        try:
+            return [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.pdf')]
+        except FileNotFoundError:
+            return []
+
+    def _evict(self) -> None:
+        # Rescan, other processes share the directory
+        with self._lock:
+            files = []
+            for entry in self._entries():
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime_ns, st.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            removed = 0
+            # Down to 80 % of the limit, so eviction does not run on every new page
+            for _, size, path in sorted(files):
+                if total <= 0.8 * self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            self._size = total
+        log.info('Page cache evicted %s pages, %s bytes left', removed, total)
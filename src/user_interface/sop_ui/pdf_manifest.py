@@ -0,0 +1,127 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import NamedTuple
+
+log = logging.getLogger(__name__)
+
+_HASH_CHUNK = 1024 * 1024
+
+
+class PdfInfo(NamedTuple):
+    path: Path
+    size: int
+    mtime_ns: int
+    # Strong validator: SHA-256 of the content (hex, without quotes)
+    etag: str
+
+
+class PdfManifest:
+    """
+    Manifest of the PDFs in 'FILE_DIR' with size, mtime and content hash of every file.
+
+    The directory is scanned and hashed once on first use. Afterwards a rescan (one 'stat' per file, only new
+    or changed files are hashed again) runs at most every 'refresh_interval' seconds, triggered by a lookup,
+    so a request usually answers from memory: a matching 'If-None-Match' never opens the file. Only files
+    found in the scan can be served, paths outside the directory are never part of the manifest.
+
+    Args:
+        pdf_dir (Path):             Directory with the SOP PDFs (searched recursively for '*.pdf').
+        refresh_interval (float):   Minimal seconds between two rescans.
+    """
+
+    def __init__(self, pdf_dir: Path, refresh_interval: float = 60.0):
+        self.pdf_dir = pdf_dir
+        self.refresh_interval = refresh_interval
+        self._files: dict[str, PdfInfo] = {}
+        self._scanned_at: float | None = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def get(self, filename: str) -> PdfInfo | None:
+        """
+        Return the manifest entry of a file name relative to 'pdf_dir' or 'None' if there is no such PDF.
+        """
+
+        self._maybe_refresh()
+        return self._files.get(filename)
+
+    def names(self) -> frozenset[str]:
+        """
+        Return the file names (relative to 'pdf_dir') of all PDFs in the manifest.
+        """
+
+        self._maybe_refresh()
+        return frozenset(self._files)
+
+    def version(self, filename: str) -> str | None:
+        """
+        Short content version of a PDF for cache busting URLs, 'None' if the file is unknown.
+        """
+
+        info = self.get(filename)
+        return info.etag[:16] if info else None
+
+    def refresh(self) -> int:
+        """
+        Rescan 'pdf_dir', hash new and changed files and drop removed ones.
+
+        Returns:
+            int: Number of files (re)hashed.
+        """
+
+        files: dict[str, PdfInfo] = {}
+        hashed = 0
+        for root, _, names in os.walk(self.pdf_dir):
+            for name in names:
+                if not name.lower().endswith('.pdf'):
+                    continue
+                path = Path(root) / name
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                key = path.relative_to(self.pdf_dir).as_posix()
+                old = self._files.get(key)
+                if old is not None and old.size == st.st_size and old.mtime_ns == st.st_mtime_ns:
+                    files[key] = old
+                    continue
+                try:
+                    files[key] = PdfInfo(path, st.st_size, st.st_mtime_ns, _sha256(path))
+                except OSError as e:
+                    log.warning('Could not hash PDF %s: %s', path, e)
+                    continue
+                hashed += 1
+
+        self._files = files
+        self._scanned_at = time.monotonic()
+        if hashed:
+            log.info('PDF manifest of %s: %s files, %s hashed', self.pdf_dir, len(files), hashed)
+        return hashed
+
+    def _maybe_refresh(self) -> None:
+        if self._scanned_at is not None and time.monotonic() - self._scanned_at < self.refresh_interval:
+            return
+        # The first caller rescans, concurrent requests keep using the current manifest
+        if self._scanned_at is None:
+            with self._lock:
+                if self._scanned_at is None:
+                    self.refresh()
+        elif self._lock.acquire(blocking=False):
+            try:
+                self.refresh()
+            finally:
+                self._lock.release()
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open('rb') as f:
+        while chunk := f.read(_HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
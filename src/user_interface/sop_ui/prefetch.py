@@ -0,0 +1,109 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+log = logging.getLogger(__name__)
+
+
+class _Session:
+    def __init__(self):
+        self.queue: deque[dict] = deque()
+        self.last_used = time.monotonic()
+        self.refilling = False
+
+
+class PrefetchQueue:
+    """
+    Per (user_pk, func_pk) buffer of upcoming question candidates.
+
+    The buffer is filled in a background thread with 'fill' and served with 'pop', which only revalidates
+    the buffered candidate with 'claim' (one short transaction) instead of running the whole sampler.
+    Sessions that were not used for 'idle_ttl' seconds are evicted lazily.
+
+    Args:
+        fill (Callable):    fill(usr_pk, func_pk, k, exclude) -> List[dict], draws up to k new candidates.
+        claim (Callable):   claim(q_id, usr_pk, func_pk) -> bool, revalidates and leases a candidate.
+        depth (int):        Number of candidates kept per session. 0 disables prefetching.
+        idle_ttl (float):   Seconds after which an unused session buffer is dropped.
+    """
+
+    def __init__(self, fill: Callable[[int, int, int, set], List[dict]], claim: Callable[[int, int, int], bool],
+                 depth: int = 8, idle_ttl: float = 1800):
+        self._fill = fill
+        self._claim = claim
+        self.depth = depth
+        self.idle_ttl = idle_ttl
+        self._sessions: dict[tuple[int, int], _Session] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='prefetch')
+
+    def pop(self, usr_pk: int, func_pk: int, exclude: set[int] | None = None) -> dict | None:
+        """
+        Return the next buffered question that is still valid for the user, or 'None' if the buffer ran dry.
+
+        Buffered questions in 'exclude' (e.g. skipped by the user) are dropped from the buffer.
+
+        A refill is scheduled whenever the buffer drops below half of its depth.
+        """
+
+        if self.depth <= 0:
+            return None
+
+        key = (usr_pk, func_pk)
+        while True:
+            with self._lock:
+                self._evict_idle()
+                session = self._sessions.setdefault(key, _Session())
+                session.last_used = time.monotonic()
+                question = session.queue.popleft() if session.queue else None
+                low = len(session.queue) < self.depth // 2 + 1
+
+            if low:
+                self.schedule_refill(usr_pk, func_pk)
+            if question is None:
+                return None
+            if exclude and question['q_id'] in exclude:
+                continue
+            if self._claim(question['q_id'], usr_pk, func_pk):
+                return question
+            log.info('Prefetched question %s no longer valid for user %s', question['q_id'], usr_pk)
+
+    def schedule_refill(self, usr_pk: int, func_pk: int) -> None:
+        """
+        Top up the buffer of a session in the background (at most one refill per session at a time).
+        """
+
+        if self.depth <= 0 or usr_pk is None or func_pk is None:
+            return
+
+        with self._lock:
+            session = self._sessions.setdefault((usr_pk, func_pk), _Session())
+            if session.refilling:
+                return
+            session.refilling = True
+        self._executor.submit(self._refill, usr_pk, func_pk, session)
+
+    def _refill(self, usr_pk: int, func_pk: int, session: _Session) -> None:
+        try:
+            with self._lock:
+                missing = self.depth - len(session.queue)
+                buffered = {q['q_id'] for q in session.queue}
+            if missing <= 0:
+                return
+
+            candidates = self._fill(usr_pk, func_pk, missing, buffered)
+            with self._lock:
+                session.queue.extend(candidates)
+            log.info('Prefetched %s questions for user_pk=%s func_pk=%s', len(candidates), usr_pk, func_pk)
+        except Exception:
+            log.exception('Prefetch refill failed for user_pk=%s func_pk=%s', usr_pk, func_pk)
+        finally:
+            session.refilling = False
+
+    def _evict_idle(self) -> None:
+        cutoff = time.monotonic() - self.idle_ttl
+        for key in [key for key, s in self._sessions.items() if s.last_used < cutoff and not s.refilling]:
+            del self._sessions[key]
@@ -0,0 +1,251 @@
+import sys
+import json
+import logging
+import threading
+from typing import Callable, NamedTuple
+
+from utils import db_conn, append_alternative_question, normalize_file_and_page, NearDuplicateIndex
+
+log = logging.getLogger(__name__)
+
+
+class QuestionEntry(NamedTuple):
+    q_id: int
+    question: str
+    answer: str
+    # Normalized once when the entry is added (file names are interned), 'None' if the entry has no valid file/page
+    pdf_file: str | None
+    page_number: int | None
+
+
+class QuestionBank:
+    """
+    In-memory repository of the question bank ('questions' table) with O(1) lookups by 'q_id'.
+
+    The whole table is read once on first use, every entry stores its normalized PDF file name and page
+    number so requests never run 'normalize_file_and_page' again. Alternatives appended through
+    'append_alternative' are added in place. Only what a request serves is kept in memory, large columns
+    such as 'context' and 'model' stay in the database. Changes made by other worker processes or the import CLI
+    are picked up with 'refresh' (called once per request): the 'question_changes' log maintained by
+    triggers tells which ids changed since the last refresh and only those rows are read again.
+
+    Alternatives are checked against the questions of the same PDF page with a MinHash/LSH index
+    ('NearDuplicateIndex'). A page is indexed on its first alternative and kept up to date by every later
+    change, depending on 'duplicates' a near-duplicate is only logged ('flag') or not added at all ('merge').
+
+    Args:
+        db (str):               Path to the SQLite database file.
+        statements (dict):      SQL statement mapping from /config/statements.yml
+        duplicates (str):       'merge', 'flag' or 'off', what happens to near-duplicate alternatives.
+        threshold (float):      Estimated Jaccard similarity from which an alternative is a near-duplicate.
+    """
+
+    def __init__(self, db: str, statements: dict, duplicates: str = 'merge', threshold: float = 0.8):
+        if duplicates not in ('merge', 'flag', 'off'):
+            raise ValueError(f"Unknown near-duplicate mode '{duplicates}', expected 'merge', 'flag' or 'off'")
+
+        self.db = db
+        self.statements = statements
+        self.duplicates = duplicates
+        self._near = NearDuplicateIndex(threshold=threshold)
+        self._entries: dict[int, QuestionEntry] = {}
+        self._generation: int | None = None
+        self._listeners: list[Callable[[set[int]], None]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._entries)
+
+    def __contains__(self, q_id: int) -> bool:
+        return self.get(q_id) is not None
+
+    @property
+    def loaded(self) -> bool:
+        return self._generation is not None
+
+    @property
+    def generation(self) -> int | None:
+        return self._generation
+
+    def subscribe(self, listener: Callable[[set[int]], None]) -> None:
+        """
+        Call 'listener' with the ids of added, updated or removed entries after every change of the cache.
+        """
+
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def entries(self) -> list[QuestionEntry]:
+        """
+        Return all cached entries (loads the question bank if needed).
+        """
+
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._entries.values())
+
+    def cached(self, q_id: int) -> QuestionEntry | None:
+        """
+        Return the cached entry of a question id without falling back to the database.
+        """
+
+        return self._entries.get(q_id)
+
+    def refresh(self) -> int:
+        """
+        Bring the cache up to date with the 'questions' table.
+
+        Costs one primary key lookup ('SELECT_QUESTION_GENERATION') if nothing changed. The first call
+        loads the whole table, later calls only read the ids logged in 'question_changes' since then.
+
+        Returns:
+            int: Number of added, updated or removed entries.
+        """
+
+        with db_conn(self.db) as (con, cur):
+            generation = cur.execute(self.statements['SELECT_QUESTION_GENERATION']).fetchone()[0] or 0
+            if generation == self._generation:
+                return 0
+
+            if self._generation is None:
+                changed = None
+                # Stream the rows instead of materializing the whole table next to the cache
+                rows = cur.execute(self.statements['SELECT_QUESTIONS_AFTER'], (0,))
+            else:
+                changes = cur.execute(self.statements['SELECT_QUESTION_CHANGES'], (self._generation,))
+                changed = {row[0] for row in changes}
+                rows = cur.execute(self.statements['SELECT_QUESTIONS_BY_IDS'], (json.dumps(list(changed)),))
+                rows = rows.fetchall()
+
+            with self._lock:
+                touched = set()
+                for row in rows:
+                    self._add(*row)
+                    touched.add(row[0])
+                loaded = len(touched)
+                removed = changed - touched if changed else set()
+                for q_id in removed:
+                    self._drop(q_id)
+                self._generation = generation
+
+        self._notify(touched | removed)
+
+        log.info('Question bank at generation %s: %s entries loaded, %s removed (%s total)', generation, loaded,
+                 len(removed), len(self._entries))
+        return loaded + len(removed)
+
+    def pages(self) -> set[tuple[str, int]]:
+        """
+        Return all '(pdf_file, page_number)' pairs referenced by the question bank (loads it if needed).
+        """
+
+        self._ensure_loaded()
+        with self._lock:
+            return {(e.pdf_file, e.page_number) for e in self._entries.values() if e.pdf_file is not None}
+
+    def get(self, q_id: int) -> QuestionEntry | None:
+        """
+        Return the entry of a question id or 'None' if it does not exist in the question bank.
+        """
+
+        self._ensure_loaded()
+        entry = self._entries.get(q_id)
+        if entry is not None:
+            return entry
+
+        with db_conn(self.db) as (con, cur):
+            row = cur.execute(self.statements['SELECT_QUESTION'], (q_id,)).fetchone()
+        if row is None:
+            return None
+        with self._lock:
+            return self._add(*row)
+
+    def append_alternative(self, alt_question: str | None, alt_answer: str | None, file_name: str,
+                           page: int) -> int | None:
+        """
+        Append an alternative question to the question bank and add it to the cache.
+
+        See 'append_alternative_question', nothing is written unless both texts are present. In 'merge'
+        mode a near-duplicate of a question on the same page is not written either.
+
+        Returns:
+            int | None: Newly assigned q_id if a new entry was added, otherwise None.
+        """
+
+        if self.duplicates != 'off' and alt_question and alt_question.strip():
+            match = self.find_near_duplicate(alt_question, file_name, page)
+            if match is not None:
+                entry, similarity = match
+                log.info('Alternative for %s page %s is a near-duplicate of q_id %s (similarity %.2f)%s',
+                         file_name, page, entry.q_id, similarity, ', not added' if self.duplicates == 'merge' else '')
+                if self.duplicates == 'merge':
+                    return None
+
+        q_id = append_alternative_question(db=self.db, statements=self.statements, alt_question=alt_question,
+                                           alt_answer=alt_answer, file_name=file_name, page=page)
+        if q_id is not None:
+            with self._lock:
+                self._add(q_id, file_name, str(page), alt_question.strip(), alt_answer.strip())
+            self._notify({q_id})
+        return q_id
+
+    def find_near_duplicate(self, question: str, file_name: str, page: int | str) -> tuple[QuestionEntry, float] | None:
+        """
+        Return the most similar question of the same PDF page and its estimated Jaccard similarity, or 'None'
+        if no question of the page reaches the threshold.
+        """
+
+        self._ensure_loaded()
+        try:
+            pdf_file, page_number = normalize_file_and_page(file_name, str(page))
+        except RuntimeError:
+            return None
+
+        key = (pdf_file, page_number)
+        with self._lock:
+            if key not in self._near:
+                # First alternative for this page: one pass over the cache, later changes are added by '_add'
+                self._near.load(key, [(e.q_id, e.question) for e in self._entries.values()
+                                      if e.page_number == page_number and e.pdf_file == pdf_file])
+            matches = self._near.query(key, question)
+            if not matches:
+                return None
+            q_id, similarity = matches[0]
+            return self._entries[q_id], similarity
+
+    def _notify(self, q_ids: set[int]) -> None:
+        if not q_ids:
+            return
+        for listener in self._listeners:
+            try:
+                listener(q_ids)
+            except Exception:
+                log.exception('Question bank listener %r failed', listener)
+
+    def _ensure_loaded(self) -> None:
+        if self._generation is None:
+            self.refresh()
+
+    def _add(self, q_id: int, file_name: str | None, page: str | None, question: str,
+             answer: str) -> QuestionEntry:
+        pdf_file, page_number = None, None
+        if file_name and page:
+            try:
+                pdf_file, page_number = normalize_file_and_page(file_name, page)
+                # Thousands of questions share a few hundred files, keep one string object per file
+                pdf_file = sys.intern(pdf_file)
+            except RuntimeError:
+                log.warning('Question %s has an invalid page "%s"', q_id, page)
+
+        self._drop(q_id)
+        entry = QuestionEntry(q_id, question, answer, pdf_file, page_number)
+        self._entries[q_id] = entry
+        if (pdf_file, page_number) in self._near:
+            self._near.add((pdf_file, page_number), q_id, question)
+        return entry
+
+    def _drop(self, q_id: int) -> None:
+        entry = self._entries.pop(q_id, None)
+        if entry is not None:
+            self._near.remove((entry.pdf_file, entry.page_number), q_id)
@@ -1,4 +1,8 @@
 from .logger import setup_logging, get_logger
-from .database import db_conn, db_push, preview_db, sampling, get_user_pk_and_func_by_username, append_alternative_question_to_json
+from .database import db_conn, db_push, preview_db, sampling, get_user_pk_and_func_by_username, append_alternative_question, release_lease, claim_question, prefetch_candidates, held_question, \
+    get_skipped_questions, add_skipped_question, clear_skipped_questions, push_annotations, pool_stats, get_question, import_question_bank, \
+    export_question_bank, db_health, exclude_from_sampling, submission_settled, table_columns, iter_table_rows, AnnotationWriteBehind
 from .load_env import __load_env
-from .yml_load import load_yaml
\ No newline at end of file
+from .yml_load import load_yaml
+from .question_files import normalize_file_and_page
+from .near_duplicates import NearDuplicateIndex
@@ -1 +1,6 @@
-from .db_functions import db_conn, db_push, preview_db, sampling, get_user_pk_and_func_by_username, append_alternative_question_to_json
\ No newline at end of file
+from .db_functions import db_conn, db_push, preview_db, sampling, get_user_pk_and_func_by_username, append_alternative_question, release_lease, claim_question, prefetch_candidates, held_question, \
+    get_skipped_questions, add_skipped_question, clear_skipped_questions, push_annotations, \
+    get_question, import_question_bank, export_question_bank, db_health, exclude_from_sampling, submission_settled
+from .pool import pool_stats
+from .preview import table_columns, iter_table_rows
+from .write_behind import AnnotationWriteBehind
@@ -1,4 +1,5 @@
 import os
+import time
 import random
 import logging
 
@@ -7,19 +8,24 @@ import json
 import sqlite3
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Sequence, List
+from collections import Counter
+from itertools import islice
+from typing import Sequence, List, Iterable
+
+from .question_index import question_index
+from .pool import get_pool, begin_immediate
 
 log = logging.getLogger(__name__)
 
 @contextmanager
 def db_conn(db: str):
     """
-    Context manager for a SQLite database connection with foreign key support enabled.
+    Context manager for a pooled SQLite database connection with foreign key support enabled.
 
-    This helper opens a connection to the given SQLite database, explicitly enables
-    foreign key constraint enforcement, and yields both the connection and a cursor.
-    On normal exit, the transaction is committed. The connection is always closed,
-    even if an exception occurs inside the context.
+    This helper borrows a connection to the given SQLite database from the process wide pool
+    (see pool.py, WAL journaling and foreign keys are configured once per connection) and yields
+    both the connection and a cursor. On normal exit, the transaction is committed, if an exception
+    occurs inside the context it is rolled back. The connection is always returned to the pool.
 
     Args:
         db (str): Path to the SQLite database file.
@@ -30,85 +36,467 @@ def db_conn(db: str):
             or execution inside the context block.
     """
 
-    con = sqlite3.connect(db)
-    # ✔ Enable foreign key constraints (SQLite does NOT enable them by default)
-    con.execute('PRAGMA foreign_keys = ON;')
-
+    pool = get_pool(db)
+    con = pool.acquire()
     cur = con.cursor()
+    broken = False
     try:
-       yield con, cur
-       con.commit()
+        yield con, cur
+        con.commit()
+    except BaseException:
+        try:
+            con.rollback()
+        except sqlite3.Error:
+            broken = True
+        raise
     finally:
-       con.close()
+        cur.close()
+        pool.release(con, broken=broken)
+
+
+def db_health(db: str, statements: dict) -> dict:
+    """
+    Cheap health check of the database for '/healthz': one pooled connection and one primary key lookup
+    ('SELECT_QUESTION_GENERATION'), which also proves that the question bank tables exist.
+
+    Returns:
+        dict: 'ok', 'generation' (current question bank generation), 'latency_ms' and 'error' on failure.
+    """
+
+    start = time.perf_counter()
+    try:
+        with db_conn(db) as (con, cur):
+            generation = cur.execute(statements['SELECT_QUESTION_GENERATION']).fetchone()[0] or 0
+    except (sqlite3.Error, OSError) as e:
+        return {'ok': False, 'error': str(e), 'latency_ms': round((time.perf_counter() - start) * 1000, 2)}
+    return {'ok': True, 'generation': generation, 'latency_ms': round((time.perf_counter() - start) * 1000, 2)}
 
 
-def sampling(statements: dict, j_file: List[dict], usr_id: int, fun_id: int) -> dict:
+def sampling(statements: dict, usr_id: int, fun_id: int, mode: str | None = None,
+             exclude: set[int] | None = None, pending: set[int] | None = None) -> dict:
     """
-    Select a suitable question from 'j_file' for annotation.
+    Select a suitable question from the 'questions' table for annotation.
 
-    The function randomly samples questions and checks the annotations table to ensure:
+    A question may be annotated by the current user if:
     -   Questions with 0 annotations are allowed
     -   Questions with 1 annotation are allowed only if it was annotated by a different user
         but for the same function (func_id).
-    -   Questions with 2 annotations are removed from 'j_file'
+    -   Questions with 2 annotations are never returned
 
-    It retries up to 'len(j_file) * 3' attempts and raises an error if no suitable question can be found.
+    If question leases are enabled ('$LEASE_TTL' > 0, default 600 seconds), a returned question is leased to
+    the user. Active leases of other users count like annotations, so two annotators never get the same slot.
+    A question the user still holds a lease on is served again (e.g. on page reload).
+
+    Question ids in 'exclude' (e.g. skipped by the user) are never returned while any other question is
+    eligible. Only if the excluded questions are the last ones left, one of them is returned. Questions
+    excluded with 'exclude_from_sampling' (they cannot be served) and questions in 'pending' are never returned.
+
+    Three sampling modes are available:
+    -   'index' (default):  Draws from the in-memory eligibility index (see question_index.py) and
+                            revalidates the drawn question with one 'SELECT_JOIN'.
+    -   'sql':              Returns only the eligible question ids with one
+                            'SELECT_ANNOTATION_ELIGIBILITY' statement and picks from the result.
+    -   'random':           Legacy loop, randomly probes questions with 'SELECT_JOIN' up to
+                            three times the number of questions.
 
     Args:
         statements (dict):
             SQL statement mapping. Must include at least 'SELECT_JOIN' which returns annotation rows
             for a given question id.
-        j_file (List[dict]):
-            List of question dictionaries. Each dict must contain a 'q_id' key.
-            The list may be modified in-place (questions removed when already used twice).
         usr_id (int):
             Primary key of the current user (annotator).
         fun_id (int):
             Primary key of the current function/task the user is annotating for.
+        mode (str | None):
+            Sampling mode, defaults to '$SAMPLING_MODE' or 'index'.
+        exclude (set[int] | None):
+            Question ids to avoid, e.g. the ids skipped by the user.
+        pending (set[int] | None):
+            Question ids the user submitted an annotation for that is not in the database yet (write-behind).
 
     Returns:
-        dict: The selected question dictionary from 'j_file'.
+        dict: The selected question ('q_id', 'file_name', 'page', 'question', 'answer'), see 'get_question'.
 
     Raises:
         RuntimeError:
-            If 'j_file' becomes empty, or if no suitable question is found after serveral attempts.
+            If the 'questions' table is empty, or if no suitable question can be found.
         ValueError:
-            If a question has more than 2 annotations (unexpected database state).
+            If a question has more than 2 annotations (unexpected database state) or the mode is unknown.
     """
 
-    max_attempts = len(j_file) * 3
-    for _ in range (max_attempts):
-        if not j_file:
-            raise RuntimeError('No questions left in j_file.')
+    mode = mode or os.getenv('SAMPLING_MODE', 'index')
+    samplers = {'index': _sampling_index, 'sql': _sampling_sql, 'random': _sampling_random}
+    if mode not in samplers:
+        raise ValueError(f'Unknown sampling mode "{mode}"')
+
+    unservable = question_index.excluded | set(pending or ())
+    exclude = set(exclude or ()) | unservable
+    held = held_question(statements=statements, usr_id=usr_id, fun_id=fun_id, exclude=exclude)
+    if held is not None:
+        return held
+
+    try:
+        return samplers[mode](statements=statements, usr_id=usr_id, fun_id=fun_id, exclude=exclude)
+    except RuntimeError:
+        if exclude == unservable:
+            raise
+        log.info('Only excluded questions left for user %s, sampling without exclusions', usr_id)
+        return samplers[mode](statements=statements, usr_id=usr_id, fun_id=fun_id, exclude=unservable)
+
+
+def exclude_from_sampling(q_ids: Iterable[int]) -> None:
+    """
+    Replace the set of questions this process never samples (e.g. their PDF is missing or the page is invalid).
+
+    Applies to all sampling modes and to 'prefetch_candidates'. The set lives in the process wide
+    'question_index' and has to be set in every worker process.
+    """
+
+    question_index.set_excluded(q_ids)
+
+
+def is_eligible(anno_rows: List[tuple], usr_id: int, fun_id: int) -> bool:
+    """
+    Apply the two-annotator rule to the 'SELECT_JOIN' rows of one question.
+
+    Raises:
+        ValueError: If the question has more than 2 annotations.
+    """
+
+    if len(anno_rows) == 0:
+        return True
+    if len(anno_rows) == 1:
+        annotator, ano_fun = anno_rows[0][1], anno_rows[0][4]
+        return annotator != usr_id and ano_fun == fun_id
+    if len(anno_rows) == 2:
+        return False
+    raise ValueError('Something went wrong. Questions can not annotated more than twice.')
+
+
+def lease_ttl() -> int:
+    """
+    Lease duration in seconds from '$LEASE_TTL' (default 600). A value <= 0 disables leases.
+    """
+
+    return int(os.getenv('LEASE_TTL', '600'))
+
+
+def _acquire(con: sqlite3.Connection, cur: sqlite3.Cursor, statements: dict, q_id: int, usr_id: int,
+             fun_id: int) -> tuple[bool, List[tuple]]:
+    """
+    Check a candidate question and, if leases are enabled, lease it to the user in one write transaction.
+
+    'BEGIN IMMEDIATE' takes the database write lock before the check, so two concurrent requests can not
+    both lease the last free slot of a question. Expired leases are removed in the same transaction, there is
+    no separate clean-up job.
+
+    Returns:
+        tuple[bool, List[tuple]]: Whether the question was acquired, and its 'SELECT_JOIN' annotation rows.
+    """
+
+    ttl = lease_ttl()
+    if ttl <= 0:
+        anno_a = cur.execute(statements['SELECT_JOIN'], [q_id]).fetchall()
+        return is_eligible(anno_a, usr_id=usr_id, fun_id=fun_id), anno_a
+
+    now = time.time()
+    begin_immediate(cur)
+    try:
+        cur.execute(statements['DELETE_EXPIRED_LEASES'], (now,))
+        anno_a = cur.execute(statements['SELECT_JOIN'], [q_id]).fetchall()
+        leases = cur.execute(statements['SELECT_LEASES'], (q_id, usr_id, now)).fetchall()
+
+        # Leases of other users take a slot just like an annotation by that user (unless already annotated)
+        slots = [(row[1], row[4]) for row in anno_a]
+        slots += [tuple(lease) for lease in leases if lease[0] not in {s[0] for s in slots}]
+        acquired = is_eligible(anno_a, usr_id=usr_id, fun_id=fun_id) and _slots_free(slots, usr_id, fun_id)
+        if acquired:
+            cur.execute(statements['UPSERT_LEASE'], (q_id, usr_id, fun_id, now + ttl))
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+    return acquired, anno_a
+
+
+def _slots_free(slots: List[tuple], usr_id: int, fun_id: int) -> bool:
+    if len(slots) == 0:
+        return True
+    if len(slots) == 1:
+        annotator, function = slots[0]
+        return annotator != usr_id and function == fun_id
+    return False
+
+
+def claim_question(statements: dict, q_id: int, usr_id: int, fun_id: int) -> bool:
+    """
+    Revalidate a previously drawn question and lease it to the user.
+
+    Used to serve prefetched candidates: the two-annotator rule and the leases of other users are checked
+    against the current database state in one write transaction.
+
+    Returns:
+        bool: True if the user may annotate the question now (and holds the lease), otherwise False.
+    """
+
+    with db_conn(os.getenv('DATA_DIR')) as (con, cur):
+        return _acquire(con, cur, statements, q_id, usr_id, fun_id)[0]
+
+
+def prefetch_candidates(statements: dict, usr_id: int, fun_id: int, k: int,
+                        exclude: set[int] | None = None) -> List[dict]:
+    """
+    Draw up to 'k' distinct questions the user may currently annotate according to the 'question_index'.
+
+    Nothing is leased or revalidated, the candidates have to be checked with 'claim_question' when served.
+
+    Args:
+        statements (dict):          SQL statement mapping from /config/statements.yml
+        usr_id (int):               Primary key of the current user.
+        fun_id (int):               Primary key of the current function.
+        k (int):                    Maximum number of candidates.
+        exclude (set[int] | None):  Question ids that must not be drawn (e.g. already buffered).
+
+    Returns:
+        List[dict]: Candidate question dictionaries, fewer than 'k' if the index runs out.
+    """
+
+    exclude = set(exclude or ())
+    candidates = []
+    with db_conn(os.getenv('DATA_DIR')) as (con, cur):
+        if not question_index.loaded:
+            question_index.load(cur=cur, statements=statements)
+        question_index.sync(cur=cur, statements=statements)
+
+        while len(candidates) < k:
+            q_id = question_index.choice(usr_id=usr_id, fun_id=fun_id, exclude=exclude)
+            if q_id is None:
+                break
+            exclude.add(q_id)
+            question = _question(cur, statements, q_id)
+            if question is not None:
+                candidates.append(question)
+    return candidates
+
+
+def _question(cur: sqlite3.Cursor, statements: dict, q_id: int) -> dict | None:
+    row = cur.execute(statements['SELECT_QUESTION'], (q_id,)).fetchone()
+    if row is None:
+        return None
+    return dict(zip(('q_id', 'file_name', 'page', 'question', 'answer'), row))
+
+
+def get_question(statements: dict, q_id: int) -> dict | None:
+    """
+    Look up one question of the question bank by its id (primary key lookup in the 'questions' table).
+
+    Args:
+        statements (dict):  SQL statement mapping from /config/statements.yml
+        q_id (int):         Question id.
+
+    Returns:
+        dict | None: The question with the keys 'q_id', 'file_name', 'page', 'question' and 'answer'
+        (the layout of the JSON question bank) or 'None' if the id does not exist.
+    """
+
+    with db_conn(os.getenv('DATA_DIR')) as (con, cur):
+        return _question(cur, statements, q_id)
+
+
+def held_question(statements: dict, usr_id: int, fun_id: int, exclude: set[int] | None = None) -> dict | None:
+    """
+    Return the question the user currently holds an active lease on (renewing the lease), if any.
+
+    A leased question in 'exclude' is not returned, e.g. one the user skipped or just submitted while the
+    annotation is not written yet (the lease is only released once it is, see 'submission_settled').
+    """
+
+    if lease_ttl() <= 0:
+        return None
+
+    with db_conn(os.getenv('DATA_DIR')) as (con, cur):
+        row = cur.execute(statements['SELECT_USER_LEASE'], (usr_id, fun_id, time.time())).fetchone()
+        if row is None or row[0] in (exclude or ()):
+            return None
+
+        question = _question(cur, statements, row[0])
+        if question is None or not _acquire(con, cur, statements, row[0], usr_id, fun_id)[0]:
+            return None
+
+    log.info('Question %s still leased to user %s, serving it again', row[0], usr_id)
+    return question
+
+
+def submission_settled(statements: dict, q_id: int, usr_id: int) -> bool:
+    """
+    Whether a submitted annotation is settled in the database: the row exists or the lease is gone (the
+    write-behind writer releases it after the write, also if the row was rejected).
+
+    Checks the database, so the answer is the same in every worker process.
+    """
+
+    with db_conn(os.getenv('DATA_DIR')) as (con, cur):
+        return bool(cur.execute(statements['SELECT_SUBMISSION_SETTLED'], {'q_id': q_id, 'usr_id': usr_id}).fetchone()[0])
+
+
+def _encode_bitmap(q_ids: set[int]) -> bytes:
+    bitmap = bytearray(max(q_ids, default=0) // 8 + 1)
+    for q_id in q_ids:
+        bitmap[q_id // 8] |= 1 << (q_id % 8)
+    return bytes(bitmap)
+
+
+def _decode_bitmap(bitmap: bytes) -> set[int]:
+    return {idx * 8 + bit for idx, byte in enumerate(bitmap) if byte for bit in range(8) if byte & (1 << bit)}
+
+
+def get_skipped_questions(statements: dict, usr_id: int, fun_id: int) -> set[int]:
+    """
+    Return the question ids the user skipped for the given function.
+
+    Skips are stored server side as one bitmap per (user, function) in the 'question_skips' table.
+    """
+
+    with db_conn(os.getenv('DATA_DIR')) as (con, cur):
+        row = cur.execute(statements['SELECT_SKIPS'], (usr_id, fun_id)).fetchone()
+    return _decode_bitmap(row[0]) if row else set()
+
+
+def add_skipped_question(statements: dict, usr_id: int, fun_id: int, q_id: int) -> None:
+    """
+    Add a question id to the skip bitmap of the user (read-modify-write in one write transaction).
+    """
+
+    with db_conn(os.getenv('DATA_DIR')) as (con, cur):
+        begin_immediate(cur)
+        row = cur.execute(statements['SELECT_SKIPS'], (usr_id, fun_id)).fetchone()
+        skipped = _decode_bitmap(row[0]) if row else set()
+        skipped.add(q_id)
+        cur.execute(statements['UPSERT_SKIPS'], (usr_id, fun_id, _encode_bitmap(skipped)))
+
+
+def clear_skipped_questions(statements: dict, usr_id: int, fun_id: int) -> None:
+    """
+    Forget all skips of the user for the given function.
+    """
+
+    with db_conn(os.getenv('DATA_DIR')) as (con, cur):
+        cur.execute(statements['DELETE_SKIPS'], (usr_id, fun_id))
+
+
+def release_lease(statements: dict, q_id: int, usr_id: int) -> None:
+    """
+    Release the lease of a user on a question, called when the question is submitted or skipped.
 
-        question = random.choice(j_file)
-        q_rand_id = question['q_id']
+    Args:
+        statements (dict):  SQL statement mapping from /config/statements.yml
+        q_id (int):         Question id of the lease.
+        usr_id (int):       Primary key of the user holding the lease.
+    """
+
+    if lease_ttl() <= 0:
+        return
+
+    with db_conn(os.getenv('DATA_DIR')) as (con, cur):
+        cur.execute(statements['DELETE_LEASE'], (q_id, usr_id))
+
+
+def _sampling_index(statements: dict, usr_id: int, fun_id: int, exclude: set[int]) -> dict:
+    """
+    Draw a question from the process wide 'question_index'.
+
+    The drawn question is revalidated (and leased) with '_acquire' since other worker processes may have
+    annotated or leased it in the meantime. Stale entries are refreshed from the database, leased questions
+    are excluded and the draw is repeated.
+    """
+
+    blocked = set(exclude)
+    with db_conn(os.getenv('DATA_DIR')) as (con, cur):
+        if not question_index.loaded:
+            question_index.load(cur=cur, statements=statements)
+        question_index.sync(cur=cur, statements=statements)
+
+        while True:
+            q_id = question_index.choice(usr_id=usr_id, fun_id=fun_id, exclude=blocked)
+            if q_id is None:
+                raise RuntimeError('No suitable question left for this user and function.')
+
+            question = _question(cur, statements, q_id)
+            if question is None:
+                log.info('Question %s was removed from the question bank, dropping it from the index', q_id)
+                question_index.remove(q_id)
+                continue
+
+            acquired, anno_a = _acquire(con, cur, statements, q_id, usr_id, fun_id)
+            if acquired:
+                log.info('Question %s sampled from index (%s annotations)', q_id, len(anno_a))
+                return question
+
+            if is_eligible(anno_a, usr_id=usr_id, fun_id=fun_id):
+                log.info('Question %s is leased by another user', q_id)
+                blocked.add(q_id)
+                continue
+
+            # Index was stale (annotation from another process), refresh this question and draw again
+            log.info('Question %s annotated elsewhere, refreshing index entry', q_id)
+            question_index.refresh(q_id, [(row[1], row[4]) for row in anno_a])
+
+
+def _sampling_sql(statements: dict, usr_id: int, fun_id: int, exclude: set[int]) -> dict:
+    """
+    Pick a question with a single query that returns only the eligible question ids.
+
+    'SELECT_ANNOTATION_ELIGIBILITY' joins the questions with their annotations and the active leases of other
+    users, grouped by question: a question without either, or with exactly one slot taken by another user of
+    the same function, is eligible unless it is in 'exclude'.
+    """
+
+    with db_conn(os.getenv('DATA_DIR')) as (con, cur):
+        params = {'usr_id': usr_id, 'fun_id': fun_id, 'now': time.time(), 'exclude': json.dumps(sorted(exclude))}
+        candidates = [row[0] for row in cur.execute(statements['SELECT_ANNOTATION_ELIGIBILITY'], params)]
+
+        # Another request may lease a candidate between the query and the claim, drop it and pick again
+        while candidates:
+            q_id = candidates.pop(random.randrange(len(candidates)))
+            if _acquire(con, cur, statements, q_id, usr_id, fun_id)[0]:
+                log.info('Question %s sampled via SQL (%s candidates)', q_id, len(candidates) + 1)
+                return _question(cur, statements, q_id)
+
+    raise RuntimeError('No suitable question left for this user and function.')
+
+
+def _sampling_random(statements: dict, usr_id: int, fun_id: int, exclude: set[int]) -> dict:
+    """
+    Legacy sampler: randomly probe questions until one passes the two-annotator rule.
+
+    It retries up to three times the number of questions and raises an error if no suitable question can be found.
+    """
+
+    with db_conn(os.getenv('DATA_DIR')) as (con, cur):
+        pool = [row[0] for row in cur.execute(statements['SELECT_LENGTH']) if row[0] not in exclude]
+    if not pool:
+        raise RuntimeError('No questions left outside the excluded ids.')
+
+    max_attempts = len(pool) * 3
+    for _ in range (max_attempts):
+        q_rand_id = random.choice(pool)
 
         with db_conn(os.getenv('DATA_DIR')) as (con, cur):
-            anno_a = cur.execute(statements['SELECT_JOIN'], [q_rand_id]).fetchall()
+            acquired, anno_a = _acquire(con, cur, statements, q_rand_id, usr_id, fun_id)
+            question = _question(cur, statements, q_rand_id) if acquired else None
 
-        # If question not in annotation table:
         if len(anno_a) == 0:
             log.info('Question %s is not in annotation table yet', q_rand_id)
-            return question
-
-        # If question is annotated once
         elif len(anno_a) == 1:
-            # If same function but different User annotate!
-            annotator, ano_fun = anno_a[0][1], anno_a[0][4]
             log.info(
                 'Question id: %s already annotated:\n user_id=%s (current=%s), func_id=%s (current=%s)',
-                q_rand_id, annotator, usr_id, ano_fun, fun_id)
-            if annotator != usr_id and ano_fun == fun_id:
-                log.info(' ---  SAME FUNCTION BUT DIFFERENT USER ---')
-                return question
-
+                q_rand_id, anno_a[0][1], usr_id, anno_a[0][4], fun_id)
         elif len(anno_a) == 2:
             log.warning(f'Question_id: {q_rand_id}, has been used twice already')
-            continue
 
-        else:
-            raise ValueError('Something went wrong. Questions can not annotated more than twice.')
+        if acquired:
+            return question
 
     raise RuntimeError('Could not find a suitable question after several attempts.')
 
@@ -123,9 +511,11 @@ def db_push(data: List[tuple] | List[str], db: str, table: str, statements:dict,
     -   Adding a new user into 'user' table (user_add = True, table = 'user')
         and returning the user primary key.
     -   Adding an annotation into the 'annotations' table (user_add = False, table = 'annotations')
-        no pk is returned
+        no pk is returned. More than one row is handed to 'push_annotations' (bulk path).
 
-    Duplicate checks are performed via func: check_entry before inserts.
+    Duplicates are detected by the UNIQUE constraints of the tables (see sop_sql/migrations.py):
+    'INSERT ... ON CONFLICT DO NOTHING RETURNING Id' inserts the row or returns nothing if it is
+    already present, in which case the existing primary key is looked up through the index.
 
     Notes:
         - Only runs when "db == os.getenv('DATA_DIR')"
@@ -151,54 +541,147 @@ def db_push(data: List[tuple] | List[str], db: str, table: str, statements:dict,
     """
 
     if db == os.getenv('DATA_DIR'):
+        if not user_add and table == 'annotations' and len(data) > 1:
+            results = push_annotations(rows=data, db=db, statements=statements)
+            log.info('Bulk annotation push: %s', dict(Counter(status for _, status, _ in results)))
+            return None
+
         with db_conn(db) as (con, cur):
             if user_add and table == 'function':
                 try:
-                    # check if function in Function table:
-                    names = ','.join(get_insert_columns(cur=cur, table=table))
-                    if check_entry(cur=cur, data=data, statements=statements, col_names=names, table=table):
-                        exec_cmd = statements['INSERT_IN_FUNCTION']
-                        cur.execute(exec_cmd, data)
-                        con.commit()
-                    else:
+                    row = cur.execute(statements['INSERT_IN_FUNCTION'], data).fetchone()
+                    if row is None:
                         log.info('function already present')
-                    exec_cmd = statements['SELECT_PK_FUNCTION'].format(function=data[0])
-                    pk_function = cur.execute(exec_cmd).fetchone()[0]
-                    return pk_function
-                except ValueError as e:
+                        row = cur.execute(statements['SELECT_PK_FUNCTION'], data).fetchone()
+                    return row[0]
+                except (ValueError, sqlite3.ProgrammingError) as e:
                     log.error(f'Function could not be added FormatError: {e}')
 
             if user_add and table == 'user':
                 try:
-                    # check if user already in User table:
-                    names = ','.join(get_insert_columns(cur=cur, table=table))
-                    if check_entry(cur=cur, data=data, statements=statements, col_names=names, table=table):
-                        exec_cmd = statements['INSERT_IN_USER']
-                        cur.execute(exec_cmd, data[0])
-                        con.commit()
-                    else:
+                    row = cur.execute(statements['INSERT_IN_USER'], data[0]).fetchone()
+                    if row is None:
                         log.info('user already present')
-
-                    exec_cmd = statements['SELECT_PK_USER']
-                    pk_user = cur.execute(exec_cmd, data[0]).fetchone()[0]
-                    return pk_user
-                except ValueError as e:
+                        row = cur.execute(statements['SELECT_PK_USER'], data[0]).fetchone()
+                    return row[0]
+                except (ValueError, sqlite3.ProgrammingError) as e:
                     log.error(f'User could not be added FormatError: {e}')
 
             elif not user_add and table == 'annotations':
                 try:
-                    # check if annotation already in annotations table
-                    names = ','.join(get_insert_columns(cur=cur, table=table))
-                    if not check_entry(cur=cur, data=data, statements=statements, col_names=names, table=table):
-                        raise RuntimeError('Logic error: entry check failed since Annotation already in the table!')
-
-                    # Insert into annotation table
-                    exec_cmd = statements['INSERT_IN_ANNOTATION']
-                    cur.execute(exec_cmd, data[0])
-                except ValueError as e:
+                    row = cur.execute(statements['INSERT_IN_ANNOTATION'], data[0]).fetchone()
+                    if row is None:
+                        raise RuntimeError('Logic error: Annotation already in the table!')
+                    _record_annotation(cur=cur, statements=statements, row=data[0])
+                except (ValueError, sqlite3.ProgrammingError) as e:
                     log.error(f'Annotation could not be added FormatError: {e}')
                 except RuntimeError as e:
                     log.error(f"Annotation could not be added RuntimeError: {e}")
+                except sqlite3.IntegrityError as e:
+                    log.error(f'Annotation could not be added IntegrityError: {e}')
+
+def push_annotations(rows: Iterable[Sequence], db: str, statements: dict, chunk_size: int = 500,
+                     record_index: bool = True) -> List[tuple[int, str, str | None]]:
+    """
+    Bulk insert annotation rows in chunked transactions and report the outcome of every row.
+
+    Each chunk is validated with 'validate_rows_for_table_db', checked against existing
+    '(question_id, annotator)' keys with one indexed query and inserted with 'executemany' in one
+    write transaction. If a chunk violates a table constraint (e.g. a rating out of range) or fewer rows
+    were inserted than expected, it is retried row by row, so every status reflects the rows actually
+    inserted and only the offending rows are rejected.
+
+    Args:
+        rows (Iterable[Sequence]):
+            Annotation rows in 'INSERT_IN_ANNOTATION' column order. Consumed lazily, chunk by chunk.
+        db (str):
+            Path to the SQLite database file.
+        statements (dict):
+            SQL statement mapping from /config/statements.yml
+        chunk_size (int):
+            Number of rows per transaction.
+        record_index (bool):
+            Register accepted rows with the 'question_index' (False if they were registered when queued).
+
+    Returns:
+        List[tuple[int, str, str | None]]:
+            (row index, status, reason) per input row, status is 'accepted', 'duplicate' or 'rejected'.
+    """
+
+    results: List[tuple[int, str, str | None]] = []
+    seen: set[tuple] = set()
+    iterator = iter(enumerate(rows))
+
+    while chunk := list(islice(iterator, chunk_size)):
+        with db_conn(db) as (con, cur):
+            try:
+                validate_rows_for_table_db(cur=cur, table='annotations', rows=[row for _, row in chunk])
+                valid = chunk
+            except ValueError:
+                expected = len(get_insert_columns(cur, 'annotations'))
+                valid = [(idx, row) for idx, row in chunk if len(row) == expected]
+                results += [(idx, 'rejected', f'{len(row)} values, expected {expected}')
+                            for idx, row in chunk if len(row) != expected]
+
+            begin_immediate(cur)
+            keys = json.dumps(sorted({row[1] for _, row in valid if isinstance(row[1], int)}))
+            existing = set(cur.execute(statements['SELECT_ANNOTATION_KEYS'], (keys,)).fetchall())
+
+            fresh = []
+            for idx, row in valid:
+                key = (row[1], row[-1])
+                if key in existing or key in seen:
+                    results.append((idx, 'duplicate', None))
+                else:
+                    seen.add(key)
+                    fresh.append((idx, row))
+
+            inserted = None
+            cur.execute('SAVEPOINT bulk')
+            try:
+                cur.executemany(statements['INSERT_IN_ANNOTATION_BULK'], [row for _, row in fresh])
+                # 'ON CONFLICT DO NOTHING' skips rows the key check missed, they lower the row count
+                if cur.rowcount == len(fresh):
+                    inserted = fresh
+            except sqlite3.Error:
+                pass
+            if inserted is None:
+                # Constraint violation or conflict somewhere in the chunk, insert row by row to find the culprits
+                cur.execute('ROLLBACK TO bulk')
+                inserted = []
+                for idx, row in fresh:
+                    try:
+                        cur.execute(statements['INSERT_IN_ANNOTATION_BULK'], row)
+                    except sqlite3.Error as e:
+                        results.append((idx, 'rejected', str(e)))
+                        continue
+                    if cur.rowcount:
+                        inserted.append((idx, row))
+                    else:
+                        results.append((idx, 'duplicate', None))
+            cur.execute('RELEASE bulk')
+
+            for idx, row in inserted if record_index else []:
+                _record_annotation(cur=cur, statements=statements, row=row)
+            results += [(idx, 'accepted', None) for idx, _ in inserted]
+
+    return sorted(results)
+
+
+def _record_annotation(cur: sqlite3.Cursor, statements: dict, row: tuple) -> None:
+    """
+    Keep the in-memory 'question_index' in sync with an inserted annotation row.
+
+    The row layout follows 'INSERT_IN_ANNOTATION' (question_id at position 1, annotator last).
+    """
+
+    if not question_index.loaded:
+        return
+
+    q_id, annotator = row[1], row[-1]
+    func = cur.execute(statements['SELECT_FUNCTION_BY_USER'], (annotator,)).fetchone()
+    question_index.record(q_id=q_id, annotator=annotator, function=func[0] if func else None)
+
 
 def get_user_pk_and_func_by_username(statements: dict, username: str) -> tuple[int, int] | None:
     """
@@ -232,56 +715,6 @@ def get_user_pk_and_func_by_username(statements: dict, username: str) -> tuple[i
     return user_pk, func_pk
 
 
-def check_entry(cur: sqlite3.Cursor, data: List[tuple] | List[str], statements: dict,  col_names: str, table: str | None = None) -> List[tuple] | None:
-    """
-    Check whether given entries already exist in a table and filter duplicates.
-
-    The function loads all rows from the given table and compares them against the provided 'data'
-
-    Behavior depends on the 'data' input shape:
-    -   If 'data[0]' is a 'str':
-        Treats it as a single value to compare against the first column of each row.
-        Returns 'None' if it already exists, otherwise returns 'data' unchanged.
-    -   If 'data' is a list of tuples:
-        Removes rows that are already present in the table and returns remaining rows.
-        If all rows are duplicates, an empty list is returned.
-
-    Args:
-        cur (sqlite3.Cursor):               Active SQLite cursor.
-        data (List[tuple] | List[str]):     Entry Data to check.
-        statements (dict):                  SQL statement mapping from /config/statements.yml
-        col_names (str):                    Comma-separated column names to fetch from the table for the dup. check.
-        table (str | None):                 Table name to query. If 'None' SQL template handles it.
-
-    Returns:
-        List[tuple] | None:
-            - 'None' if a single string entry already exists.
-            - Otherwise, a filtered list containing only entries not yet present.
-
-    Raises:
-        ValueError:
-            If the function cannot interpret the provided 'data' type/shape.
-    """
-
-    # fetch all from table
-    exe_cmd = statements['SELECT_ALL'].format(column_names=col_names, table=table)
-    c_table = cur.execute(exe_cmd).fetchall()
-
-    if isinstance(data[0], str):
-        if any(row[0] == data[0] for row in c_table):
-            return None
-        return data
-
-    elif isinstance(data, list):
-        # for row in data check if in table
-        rows_delete = [idx for idx, row in enumerate(data) if row in c_table]
-        new_data = [row for idx, row in enumerate(data) if idx not in rows_delete]
-        # add to log indices with rows of not added entries which are already in tables
-        return new_data
-
-    raise ValueError(f'Entry could not be checked with check_entry() "{type(data)}" could not be processed')
-
-
 def get_insert_columns(cur: sqlite3.Cursor, table: str) -> List[str]:
     """
     Get insertable column names for a table, excluding autoincrement primary keys.
@@ -329,7 +762,7 @@ def validate_rows_for_table_db(cur: sqlite3.Cursor, table: str, rows: Sequence[S
     errors = [f'Row {idx} has {len(row)} values, expected {expected}' for idx, row in enumerate(rows) if len(row) != expected]
 
     if errors:
-        raise ValueError("Invalid rows for table {table}: " + " | ".join(errors))
+        raise ValueError(f"Invalid rows for table {table}: " + " | ".join(errors))
 
     return columns
 
@@ -368,18 +801,60 @@ def preview_db(db: str, pre_dir:str | None = None, limit: int | None = 100) -> N
 
     con.close()
 
-def append_alternative_question_to_json(
-    json_path: str | Path,
+def import_question_bank(json_path: str | Path, db: str, statements: dict) -> int:
+    """
+    Import a JSON question bank (list of objects with 'q_id', 'question' and 'answer' and optionally
+    'file_name', 'page', 'context' and 'model') into the 'questions' table.
+
+    The import keeps the 'q_id' of every entry and is idempotent: ids that already exist are skipped,
+    so the same file can be imported on every start.
+
+    Args:
+        json_path (str | Path): Path to the JSON question bank.
+        db (str):               Path to the SQLite database file.
+        statements (dict):      SQL statement mapping from /config/statements.yml
+
+    Returns:
+        int: Number of newly imported questions.
+
+    Raises:
+        RuntimeError: If the JSON file does not contain a list.
+    """
+
+    with Path(json_path).open('r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if not isinstance(data, list):
+        raise RuntimeError('Question bank JSON must contain a list')
+
+    rows = [(int(q['q_id']), q.get('file_name'), q.get('page'), q['question'], q['answer'], q.get('context'),
+             q.get('model')) for q in data]
+
+    with db_conn(db) as (con, cur):
+        cur.executemany(statements['INSERT_IN_QUESTION'], rows)
+        # Not 'total_changes', that also counts the 'question_changes' rows written by the triggers
+        imported = cur.rowcount
+
+    log.info('Imported %s of %s questions from %s', imported, len(rows), json_path)
+    return imported
+
+
+def append_alternative_question(
+    db: str,
+    statements: dict,
     alt_question: str | None,
     alt_answer: str | None,
     file_name: str,
     page: int
 ) -> int | None:
     """
-    Append a new alternative question and answer to the JSON question bank.
+    Append a new alternative question and answer to the question bank ('questions' table).
 
     The entry is only added if both alt_question and alt_answer are present.
-    If one or both are missing, nothing is written.
+    If one or both are missing, nothing is written. The 'question_id' comes from the AUTOINCREMENT
+    counter of the 'questions' table, so concurrent workers never hand out the same id and ids of
+    deleted questions are never reused. The insert is a single row append that is fsync'ed on commit
+    ('synchronous = FULL' for this transaction), a crash can only lose the entry, never corrupt the bank.
 
     Returns:
         int | None:
@@ -391,32 +866,49 @@ def append_alternative_question_to_json(
     if not alt_question or not alt_answer:
         return None
 
-    json_path = Path(json_path)
+    with db_conn(db) as (con, cur):
+        cur.execute('PRAGMA synchronous = FULL')
+        try:
+            cur.execute(statements['INSERT_IN_QUESTION'],
+                        (None, file_name, str(page), alt_question, alt_answer, None, None))
+            con.commit()
+        finally:
+            cur.execute('PRAGMA synchronous = NORMAL')
+        return cur.lastrowid
 
-    with json_path.open('r', encoding='utf-8') as f:
-        data = json.load(f)
 
-    if not isinstance(data, list):
-        raise RuntimeError('Question bank JSON must contain a list')
+def export_question_bank(db: str, statements: dict, json_path: str | Path) -> int:
+    """
+    Write the whole 'questions' table (imported questions and alternatives) to a JSON question bank.
 
-    existing_ids = [
-        int(item.get('q_id', 0))
-        for item in data
-        if str(item.get('q_id', '')).isdigit()
-    ]
-    new_q_id = max(existing_ids, default=0) + 1
+    The file is written next to the target, fsync'ed and moved into place with an atomic rename, so
+    readers see either the old or the new file and a crash never leaves a half written bank.
 
-    new_entry = {
-        "q_id": new_q_id,
-        "file_name": file_name,
-        "page": str(page),
-        "question": alt_question,
-        "answer": alt_answer
-    }
+    Args:
+        db (str):               Path to the SQLite database file.
+        statements (dict):      SQL statement mapping from /config/statements.yml
+        json_path (str | Path): Target JSON file.
 
-    data.append(new_entry)
+    Returns:
+        int: Number of exported questions.
+    """
+
+    with db_conn(db) as (con, cur):
+        rows = cur.execute(statements['SELECT_QUESTIONS_EXPORT']).fetchall()
+
+    keys = ('q_id', 'file_name', 'page', 'question', 'answer', 'context', 'model')
+    data = [{k: v for k, v in zip(keys, row) if v is not None} for row in rows]
 
-    with json_path.open('w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    json_path = Path(json_path)
+    tmp_path = json_path.with_name(f'.{json_path.name}.{os.getpid()}.tmp')
+    try:
+        with tmp_path.open('w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, json_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
-    return new_q_id
\ No newline at end of file
+    log.info('Exported %s questions to %s', len(data), json_path)
+    return len(data)
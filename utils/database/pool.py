@@ -0,0 +1,161 @@
+import os
+import time
+import logging
+import sqlite3
+import threading
+
+log = logging.getLogger(__name__)
+
+# Process wide counters, see pool_stats()
+_stats = {'hits': 0, 'misses': 0, 'waits': 0, 'lock_retries': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        _stats[key] += 1
+
+
+SQLITE_PRAGMAS = (
+    # ✔ Enable foreign key constraints (SQLite does NOT enable them by default)
+    'PRAGMA foreign_keys = ON;',
+    # Readers no longer block the writer and vice versa
+    'PRAGMA journal_mode = WAL;',
+    # Safe with WAL, only the last transactions may be lost on power failure (not on app crash)
+    'PRAGMA synchronous = NORMAL;',
+    # Negative value is KiB: 16 MiB page cache per connection
+    'PRAGMA cache_size = -16000;',
+    'PRAGMA mmap_size = 134217728;',
+    'PRAGMA busy_timeout = {busy_timeout};',
+)
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections to one database file.
+
+    Connections are created lazily up to 'max_size' and configured once with the pragmas from
+    'SQLITE_PRAGMAS'. A connection is used by one thread at a time (borrowed with 'acquire' and returned
+    with 'release'), so the pool is safe for threaded Flask. The pool is bound to the process that
+    created its connections: after a fork (e.g. gunicorn workers) the inherited connections are dropped
+    and the child opens its own.
+
+    Args:
+        db (str):           Path to the SQLite database file.
+        max_size (int):     Maximum number of open connections, further callers wait for a free one.
+    """
+
+    def __init__(self, db: str, max_size: int):
+        self.db = db
+        self.max_size = max_size
+        self._idle: list[sqlite3.Connection] = []
+        self._created = 0
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._cond:
+            self._check_fork()
+            if self._idle:
+                _count('hits')
+                return self._idle.pop()
+
+            if self._created >= self.max_size:
+                _count('waits')
+                while not self._idle:
+                    self._cond.wait()
+                return self._idle.pop()
+
+            self._created += 1
+            _count('misses')
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, con: sqlite3.Connection, broken: bool = False) -> None:
+        with self._cond:
+            if os.getpid() != self._pid:
+                return
+            if broken:
+                self._created -= 1
+                con.close()
+            else:
+                self._idle.append(con)
+            self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {'size': self._created, 'idle': len(self._idle), 'max_size': self.max_size}
+
+    def _check_fork(self) -> None:
+        # Never share SQLite connections across fork(), start with an empty pool in the child
+        if os.getpid() != self._pid:
+            self._idle = []
+            self._created = 0
+            self._pid = os.getpid()
+
+    def _connect(self) -> sqlite3.Connection:
+        busy_timeout = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+        con = sqlite3.connect(self.db, timeout=busy_timeout / 1000, check_same_thread=False)
+        for pragma in SQLITE_PRAGMAS:
+            con.execute(pragma.format(busy_timeout=busy_timeout))
+        log.info('Opened pooled SQLite connection to %s', self.db)
+        return con
+
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db: str) -> ConnectionPool:
+    """
+    Return the connection pool of a database file, creating it on first use.
+
+    The pool size is read from '$SQLITE_POOL_SIZE' (default 8).
+    """
+
+    with _pools_lock:
+        pool = _pools.get(db)
+        if pool is None:
+            pool = _pools[db] = ConnectionPool(db=db, max_size=int(os.getenv('SQLITE_POOL_SIZE', '8')))
+        return pool
+
+
+def begin_immediate(cur: sqlite3.Cursor, retries: int = 3) -> None:
+    """
+    Start a write transaction, retrying if the database stays locked longer than the busy timeout.
+
+    Args:
+        cur (sqlite3.Cursor):   Cursor of a connection without an open transaction.
+        retries (int):          Number of additional attempts after a 'database is locked' error.
+    """
+
+    for attempt in range(retries + 1):
+        try:
+            cur.execute('BEGIN IMMEDIATE')
+            return
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) or attempt == retries:
+                raise
+            _count('lock_retries')
+            log.warning('Database locked, retrying BEGIN IMMEDIATE (%s/%s)', attempt + 1, retries)
+            time.sleep(0.05 * (attempt + 1))
+
+
+def pool_stats() -> dict:
+    """
+    Return pool counters of this process: connection reuses ('hits'), newly opened connections ('misses'),
+    callers that had to wait for a free connection ('waits'), lock contention retries ('lock_retries') and
+    the current size of every pool.
+    """
+
+    with _stats_lock:
+        stats = dict(_stats)
+    with _pools_lock:
+        stats['pools'] = {db: pool.stats() for db, pool in _pools.items()}
+    return stats
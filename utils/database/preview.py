@@ -0,0 +1,80 @@
+from typing import Iterator, Sequence
+
+from .db_functions import db_conn
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _value(value):
+    # BLOBs are the only SQLite values JSON cannot represent
+    return value.hex() if isinstance(value, bytes) else value
+
+
+def table_columns(db: str) -> dict[str, list[str]]:
+    """
+    Return the column names of every table in the database, ordered by table name.
+
+    Args:
+        db (str):   Path to the SQLite database file.
+    """
+
+    with db_conn(db) as (con, cur):
+        tables = [row[0] for row in cur.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")]
+        return {t: [row[1] for row in cur.execute(f'PRAGMA table_info({_quote(t)})').fetchall()] for t in tables}
+
+
+def iter_table_rows(db: str, table: str, columns: Sequence[str] | None = None, after: int | None = None,
+                    limit: int | None = None, batch_size: int = 500) -> Iterator[tuple[int, dict]]:
+    """
+    Stream the rows of a table in rowid order without holding the whole table in memory.
+
+    Rows are read with keyset pagination ('WHERE rowid > ? ORDER BY rowid LIMIT batch_size'), every batch
+    borrows a pooled connection only for its own query, so a slow consumer never holds a read transaction
+    open. The table and columns are checked against the schema when this function is called, before the
+    first row is read.
+
+    Args:
+        db (str):                       Path to the SQLite database file.
+        table (str):                    Table name.
+        columns (Sequence[str] | None): Columns to read, all columns if 'None'.
+        after (int | None):             Only return rows with a rowid above this cursor.
+        limit (int | None):             Maximum number of rows, all rows if 'None'.
+        batch_size (int):               Rows read per query.
+
+    Returns:
+        Iterator[tuple[int, dict]]: '(rowid, {column: value})' pairs, the last rowid is the next cursor.
+
+    Raises:
+        ValueError: If the table or one of the columns does not exist.
+    """
+
+    schema = table_columns(db)
+    if table not in schema:
+        raise ValueError(f'Unknown table "{table}"')
+    columns = list(columns or schema[table])
+    unknown = [c for c in columns if c not in schema[table]]
+    if unknown:
+        raise ValueError(f'Unknown columns of table "{table}": {", ".join(unknown)}')
+
+    # Identifiers cannot be bound as parameters, both were checked against the schema above
+    query = (f'SELECT rowid, {", ".join(map(_quote, columns))} FROM {_quote(table)} '
+             f'WHERE rowid > ? ORDER BY rowid LIMIT ?')
+
+    def rows() -> Iterator[tuple[int, dict]]:
+        cursor = after if after is not None else -(2 ** 63)
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            with db_conn(db) as (con, cur):
+                batch = cur.execute(query, (cursor, size)).fetchall()
+            for row in batch:
+                yield row[0], {c: _value(v) for c, v in zip(columns, row[1:])}
+            if len(batch) < size:
+                return
+            cursor = batch[-1][0]
+            if remaining is not None:
+                remaining -= len(batch)
+
+    return rows()
@@ -0,0 +1,277 @@
+import json
+import random
+import logging
+import sqlite3
+import threading
+from typing import List, Iterable, Set
+
+log = logging.getLogger(__name__)
+
+_MAX_REJECTIONS = 8
+
+
+class _IndexedSet:
+    """
+    Set of integers that supports O(1) add, discard and uniform random access by position.
+
+    Items are kept in a list together with a position lookup. Removing an item swaps it with
+    the last element so the list never contains holes.
+    """
+
+    def __init__(self):
+        self._items: List[int] = []
+        self._pos: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, item: int) -> bool:
+        return item in self._pos
+
+    def __getitem__(self, idx: int) -> int:
+        return self._items[idx]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def add(self, item: int) -> None:
+        if item in self._pos:
+            return
+        self._pos[item] = len(self._items)
+        self._items.append(item)
+
+    def discard(self, item: int) -> None:
+        idx = self._pos.pop(item, None)
+        if idx is None:
+            return
+        last = self._items.pop()
+        if idx < len(self._items):
+            self._items[idx] = last
+            self._pos[last] = idx
+
+
+class QuestionIndex:
+    """
+    Live eligibility index over the question bank.
+
+    For every 'q_id' the index keeps the list of '(annotator, function)' pairs that already
+    annotated the question and places the question into exactly one bucket:
+    -   '_open':                            questions without any annotation
+    -   '_single[function][annotator]':     questions annotated once by 'annotator' of 'function'
+    -   no bucket:                          questions annotated twice (exhausted)
+
+    A user 'usr_id' of function 'fun_id' may annotate every question in '_open' and every question in
+    '_single[fun_id][a]' for 'a != usr_id', so a valid question is drawn uniformly without probing the
+    database. The index is seeded from one query ('SELECT_ANNOTATION_INDEX') and kept up to date by
+    'db_push' through 'record()'. Question ids come from the 'questions' table, see 'sync()'.
+    Questions passed to 'set_excluded()' (e.g. their PDF is missing) are kept out of every bucket.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Set by the application, not derived from the database, so it survives 'reset()'
+        self._excluded: set[int] = set()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Drop all state, the next sampling call seeds the index again.
+        """
+
+        with self._lock:
+            self._loaded = False
+            self._questions: set[int] = set()
+            self._generation: int | None = None
+            self._annotations: dict[int, List[tuple[int, int]]] = {}
+            self._open = _IndexedSet()
+            self._single: dict[int, dict[int, _IndexedSet]] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def excluded(self) -> set[int]:
+        with self._lock:
+            return set(self._excluded)
+
+    def set_excluded(self, q_ids: Iterable[int]) -> None:
+        """
+        Replace the set of questions that must never be drawn, only the difference to the current set is applied.
+        """
+
+        q_ids = set(q_ids)
+        with self._lock:
+            added, removed = q_ids - self._excluded, self._excluded - q_ids
+            for q_id in added:
+                self._unplace(q_id)
+            self._excluded = q_ids
+            for q_id in removed:
+                self._place(q_id)
+
+    def load(self, cur: sqlite3.Cursor, statements: dict) -> None:
+        """
+        Seed the annotation state from the database with a single query.
+
+        Args:
+            cur (sqlite3.Cursor):   Active SQLite cursor.
+            statements (dict):      SQL statement mapping. Must include 'SELECT_ANNOTATION_INDEX'.
+        """
+
+        rows = cur.execute(statements['SELECT_ANNOTATION_INDEX']).fetchall()
+        with self._lock:
+            self._annotations = {}
+            for q_id, annotator, function in rows:
+                self._annotations.setdefault(q_id, []).append((annotator, function))
+            self._rebuild_buckets()
+            self._loaded = True
+        log.info('Question index seeded with %s annotations', len(rows))
+
+    def sync(self, cur: sqlite3.Cursor, statements: dict) -> None:
+        """
+        Apply changes of the 'questions' table made since the last call (by any process).
+
+        Every insert, update and delete on 'questions' is logged by triggers in 'question_changes'. One
+        primary key lookup ('SELECT_QUESTION_GENERATION') tells whether the bank changed, only the changed
+        ids are read again. The first call registers all questions.
+
+        Args:
+            cur (sqlite3.Cursor):   Active SQLite cursor.
+            statements (dict):      SQL statement mapping. Must include 'SELECT_QUESTION_GENERATION',
+                                    'SELECT_QUESTION_CHANGES', 'SELECT_QUESTIONS_BY_IDS' and
+                                    'SELECT_QUESTION_IDS_AFTER'.
+        """
+
+        generation = cur.execute(statements['SELECT_QUESTION_GENERATION']).fetchone()[0] or 0
+        with self._lock:
+            if generation == self._generation:
+                return
+            since = self._generation
+
+        # The generation is read before the rows, changes in between are applied again next time
+        if since is None:
+            present = [row[0] for row in cur.execute(statements['SELECT_QUESTION_IDS_AFTER'], (0,))]
+            removed = []
+        else:
+            changed = [row[0] for row in cur.execute(statements['SELECT_QUESTION_CHANGES'], (since,))]
+            present = [row[0] for row in cur.execute(statements['SELECT_QUESTIONS_BY_IDS'], (json.dumps(changed),))]
+            removed = set(changed) - set(present)
+
+        with self._lock:
+            for q_id in present:
+                self.add_question(q_id)
+            for q_id in removed:
+                self.remove(q_id)
+            self._generation = generation
+        log.info('Question index synced to generation %s (%s added, %s removed)', generation, len(present),
+                 len(removed))
+
+    def add_question(self, q_id: int) -> None:
+        with self._lock:
+            if q_id in self._questions:
+                return
+            self._questions.add(q_id)
+            self._place(q_id)
+
+    def remove(self, q_id: int) -> None:
+        """
+        Drop a question that no longer exists in the 'questions' table.
+        """
+
+        with self._lock:
+            self._unplace(q_id)
+            self._questions.discard(q_id)
+
+    def record(self, q_id: int, annotator: int, function: int) -> None:
+        """
+        Register a new annotation. Called after every successful insert into 'annotations'.
+        """
+
+        with self._lock:
+            self._unplace(q_id)
+            self._annotations.setdefault(q_id, []).append((annotator, function))
+            self._place(q_id)
+
+    def refresh(self, q_id: int, pairs: Iterable[tuple[int, int]]) -> None:
+        """
+        Replace the annotation state of one question, e.g. with rows written by another process.
+        """
+
+        with self._lock:
+            self._unplace(q_id)
+            self._annotations[q_id] = list(pairs)
+            self._place(q_id)
+
+    def choice(self, usr_id: int, fun_id: int, exclude: Set[int] | None = None,
+               rng: random.Random | None = None) -> int | None:
+        """
+        Draw a question id the given user may annotate, uniformly over all eligible questions.
+
+        Args:
+            usr_id (int):               Primary key of the current user.
+            fun_id (int):               Primary key of the current function.
+            exclude (Set[int] | None):  Question ids that must not be returned (e.g. leased by others).
+            rng (random.Random | None): Random source, defaults to the 'random' module.
+
+        Returns:
+            int | None: An eligible 'q_id' or 'None' if no question is left for the user/function.
+        """
+
+        rng = rng or random
+        with self._lock:
+            groups = [bucket for annotator, bucket in self._single.get(fun_id, {}).items()
+                      if annotator != usr_id and len(bucket)]
+            total = len(self._open) + sum(len(g) for g in groups)
+            if total == 0:
+                return None
+
+            # Rejection sampling is exact and cheap as long as only few candidates are excluded
+            for _ in range(_MAX_REJECTIONS):
+                q_id = self._draw(groups, rng.randrange(total))
+                if not exclude or q_id not in exclude:
+                    return q_id
+
+            candidates = [q_id for bucket in [self._open, *groups] for q_id in bucket if q_id not in exclude]
+            return rng.choice(candidates) if candidates else None
+
+    def _draw(self, groups: List[_IndexedSet], pick: int) -> int:
+        if pick < len(self._open):
+            return self._open[pick]
+
+        pick -= len(self._open)
+        for bucket in groups:
+            if pick < len(bucket):
+                return bucket[pick]
+            pick -= len(bucket)
+        raise IndexError(pick)
+
+    def _rebuild_buckets(self) -> None:
+        self._open = _IndexedSet()
+        self._single = {}
+        for q_id in self._questions:
+            self._place(q_id)
+
+    def _place(self, q_id: int) -> None:
+        if q_id not in self._questions or q_id in self._excluded:
+            return
+
+        pairs = self._annotations.get(q_id, [])
+        if len(pairs) == 0:
+            self._open.add(q_id)
+        elif len(pairs) == 1:
+            annotator, function = pairs[0]
+            self._single.setdefault(function, {}).setdefault(annotator, _IndexedSet()).add(q_id)
+
+    def _unplace(self, q_id: int) -> None:
+        pairs = self._annotations.get(q_id, [])
+        if len(pairs) == 0:
+            self._open.discard(q_id)
+        elif len(pairs) == 1:
+            annotator, function = pairs[0]
+            bucket = self._single.get(function, {}).get(annotator)
+            if bucket is not None:
+                bucket.discard(q_id)
+
+
+# One index per process, shared by all request threads
+question_index = QuestionIndex()
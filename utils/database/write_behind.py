@@ -0,0 +1,158 @@
+import os
+import json
+import fcntl
+import atexit
+import logging
+import threading
+from pathlib import Path
+from typing import Sequence
+
+from .db_functions import db_conn, push_annotations, lease_ttl
+from .question_index import question_index
+
+log = logging.getLogger(__name__)
+
+
+class AnnotationWriteBehind:
+    """
+    Durable write-behind queue for annotation inserts.
+
+    'submit' appends the annotation row to an append-only journal file (fsync'ed) and returns; a background
+    writer thread group-commits the queued rows into the 'annotations' table with 'push_annotations' every
+    'flush_interval' seconds or as soon as 'batch_size' rows are waiting.
+
+    Every process writes its own journal 'annotations-<pid>.jsonl' and holds an exclusive 'flock' on it.
+    On startup, journals that are not locked (their process died) are replayed and removed. Replaying is
+    idempotent since the UNIQUE (question_id, annotator) constraint turns rows already written into duplicates.
+
+    While a row is queued, the in-memory 'question_index' already counts it and the annotator keeps the
+    lease on the question; the lease is released once the row is written, so other processes treat the
+    slot as taken in the meantime. Without leases ('$LEASE_TTL' <= 0) queued rows would be invisible to other
+    processes, so write-behind requires leases.
+
+    Args:
+        journal_dir (str | Path):   Directory for the journal files.
+        db (str):                   Path to the SQLite database file.
+        statements (dict):          SQL statement mapping from /config/statements.yml
+        batch_size (int):           Maximum number of rows per group commit.
+        flush_interval (float):     Seconds between two flushes of the queue.
+
+    Raises:
+        RuntimeError: If leases are disabled ('$LEASE_TTL' <= 0).
+    """
+
+    def __init__(self, journal_dir: str | Path, db: str, statements: dict, batch_size: int = 200,
+                 flush_interval: float = 0.5):
+        if lease_ttl() <= 0:
+            raise RuntimeError('Write-behind needs question leases, LEASE_TTL must be > 0')
+        self.journal_dir = Path(journal_dir)
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        self.db = db
+        self.statements = statements
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending: list[tuple] = []
+        self._functions: dict[int, int] = {}
+
+        self.replay()
+
+        # Created and locked under a name 'replay' ignores, then renamed: otherwise the 'replay' of a worker
+        # starting at the same time could take the new, still unlocked and empty journal and delete it
+        self._path = self.journal_dir / f'annotations-{os.getpid()}.jsonl'
+        tmp = self._path.with_name(f'.{self._path.name}.tmp')
+        self._file = tmp.open('a', encoding='utf-8')
+        fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.rename(tmp, self._path)
+
+        self._thread = threading.Thread(target=self._run, name='annotation-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def submit(self, row: Sequence) -> None:
+        """
+        Queue one annotation row ('INSERT_IN_ANNOTATION' column order). Returns once the row is on disk.
+        """
+
+        row = tuple(row)
+        with self._lock:
+            self._file.write(json.dumps(row, ensure_ascii=False) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending.append(row)
+            full = len(self._pending) >= self.batch_size
+
+        if question_index.loaded:
+            question_index.record(q_id=row[1], annotator=row[-1], function=self._function(row[-1]))
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> None:
+        """
+        Write all queued rows to the database (called by the writer thread, at exit and on demand).
+        """
+
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._pending[:self.batch_size]
+                if not batch:
+                    return
+
+                self._write(batch)
+                with self._lock:
+                    del self._pending[:len(batch)]
+                    # Everything in the journal is in the database now, start with an empty file
+                    if not self._pending:
+                        self._file.truncate(0)
+
+    def replay(self) -> None:
+        """
+        Write the rows of journals left behind by crashed or stopped processes and remove those journals.
+        """
+
+        for path in sorted(self.journal_dir.glob('annotations-*.jsonl')):
+            with path.open('r', encoding='utf-8') as file:
+                try:
+                    fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # journal of a live process
+
+                rows = [tuple(json.loads(line)) for line in file if line.strip()]
+                if rows:
+                    self._write(rows)
+                    log.info('Replayed %s journaled annotations from %s', len(rows), path)
+                path.unlink()
+
+    def _write(self, rows: list[tuple]) -> None:
+        results = push_annotations(rows=rows, db=self.db, statements=self.statements, record_index=False)
+        rejected = [(idx, reason) for idx, status, reason in results if status == 'rejected']
+        if rejected:
+            log.error('Journaled annotations rejected by the database: %s', rejected)
+
+        with db_conn(self.db) as (con, cur):
+            cur.executemany(self.statements['DELETE_LEASE'], [(row[1], row[-1]) for row in rows])
+
+    def _function(self, annotator: int) -> int | None:
+        if annotator not in self._functions:
+            with db_conn(self.db) as (con, cur):
+                row = cur.execute(self.statements['SELECT_FUNCTION_BY_USER'], (annotator,)).fetchone()
+            self._functions[annotator] = row[0] if row else None
+        return self._functions[annotator]
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                log.exception('Write-behind flush failed, retrying with the next interval')
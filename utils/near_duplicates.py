@@ -0,0 +1,178 @@
+import re
+import zlib
+import random
+from array import array
+from typing import Hashable
+
+# Mersenne prime for the permutation (a * x + b) mod p, larger than every 32 bit shingle hash
+_PRIME = (1 << 61) - 1
+_MASK = 0xFFFFFFFF
+# Offset per bin of distance for borrowed values, keeps them distinct from the values of the filled bins
+_GOLDEN = 0x9E3779B1
+
+
+def normalize_text(text: str) -> str:
+    """
+    Lowercase a question and reduce it to words separated by single spaces (punctuation is dropped).
+    """
+
+    return re.sub(r'\W+', ' ', text.lower()).strip()
+
+
+def shingles(text: str, k: int = 5) -> set[str]:
+    """
+    Character k-grams of the normalized text. Texts shorter than 'k' are a single shingle.
+    """
+
+    text = normalize_text(text)
+    if len(text) <= k:
+        return {text}
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def jaccard(a: str, b: str, k: int = 5) -> float:
+    """
+    Exact Jaccard similarity of the shingle sets of two texts.
+    """
+
+    sa, sb = shingles(a, k), shingles(b, k)
+    return len(sa & sb) / len(sa | sb)
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index that finds near-duplicate questions within the same group (e.g. '(pdf_file, page)').
+
+    Every text is reduced to a MinHash signature of 'num_perm' values over its character shingles. The
+    signature is split into 'bands' bands, texts that agree on all values of at least one band share an
+    LSH bucket and become candidates. The Jaccard similarity of a candidate is estimated from the fraction of
+    equal signature values, only candidates at or above 'threshold' are reported. With the defaults
+    (64 values, 16 bands of 4) a pair with a similarity of 0.8 becomes a candidate with a probability above 0.99.
+
+    Groups are indexed independently and are only created by 'add' or 'load', so callers can index the
+    groups they need on first use. Entries can be added and removed at any time.
+
+    Args:
+        threshold (float):  Minimal estimated Jaccard similarity of a near-duplicate.
+        num_perm (int):     Signature length, must be a multiple of 'bands'.
+        bands (int):        Number of LSH bands.
+        k (int):            Shingle length in characters.
+        seed (int):         Seed of the permutation, signatures are only comparable with the same seed.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, k: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f'num_perm ({num_perm}) must be a multiple of bands ({bands})')
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.k = k
+        self._rows = num_perm // bands
+        rng = random.Random(seed)
+        self._a, self._b = rng.randrange(1, _PRIME), rng.randrange(_PRIME)
+        # group -> {entry id -> signature} and group -> {(band, band values) -> entry ids}
+        self._signatures: dict[Hashable, dict[int, array]] = {}
+        self._buckets: dict[Hashable, dict[tuple[int, bytes], list[int]]] = {}
+
+    def __contains__(self, group: Hashable) -> bool:
+        return group in self._signatures
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._signatures.values())
+
+    def signature(self, text: str) -> array:
+        """
+        MinHash signature of a text ('num_perm' unsigned 32 bit values).
+
+        One permutation hashing: every shingle is hashed once, the hash picks one of 'num_perm' bins and the
+        minimum per bin is kept. Empty bins borrow the value of the next filled bin (shifted by the distance),
+        so the cost is linear in the text length instead of 'num_perm' hashes per shingle.
+        """
+
+        m = self.num_perm
+        bins: list[int | None] = [None] * m
+        for s in shingles(text, self.k):
+            x = (self._a * zlib.crc32(s.encode('utf-8')) + self._b) % _PRIME
+            b, v = x % m, x // m
+            if bins[b] is None or v < bins[b]:
+                bins[b] = v
+
+        # At least one bin is filled since every text has at least one shingle
+        sig = array('I', bytes(4 * m))
+        for j in range(m):
+            dist = 0
+            while bins[(j + dist) % m] is None:
+                dist += 1
+            sig[j] = (bins[(j + dist) % m] + dist * _GOLDEN) & _MASK
+        return sig
+
+    def load(self, group: Hashable, entries: list[tuple[int, str]]) -> None:
+        """
+        Index a group from scratch with '(entry id, text)' pairs. A group without entries is indexed as empty.
+        """
+
+        self._signatures[group] = {}
+        self._buckets[group] = {}
+        for entry_id, text in entries:
+            self.add(group, entry_id, text)
+
+    def add(self, group: Hashable, entry_id: int, text: str | None = None, sig: array | None = None) -> None:
+        """
+        Add (or replace) one entry of a group, either from its text or from a precomputed signature.
+        """
+
+        if sig is None:
+            sig = self.signature(text)
+        self.remove(group, entry_id)
+        self._signatures.setdefault(group, {})[entry_id] = sig
+        buckets = self._buckets.setdefault(group, {})
+        for band in self._band_keys(sig):
+            buckets.setdefault(band, []).append(entry_id)
+
+    def remove(self, group: Hashable, entry_id: int) -> None:
+        sig = self._signatures.get(group, {}).pop(entry_id, None)
+        if sig is None:
+            return
+        buckets = self._buckets[group]
+        for band in self._band_keys(sig):
+            ids = buckets[band]
+            ids.remove(entry_id)
+            if not ids:
+                del buckets[band]
+
+    def drop(self, group: Hashable) -> None:
+        """
+        Forget a whole group, e.g. once it has been processed in a batch.
+        """
+
+        self._signatures.pop(group, None)
+        self._buckets.pop(group, None)
+
+    def query(self, group: Hashable, text: str | None = None, sig: array | None = None) -> list[tuple[int, float]]:
+        """
+        Find the near-duplicates of a text (or signature) within a group.
+
+        Returns:
+            list[tuple[int, float]]: '(entry id, estimated similarity)' pairs at or above 'threshold',
+                                     most similar first.
+        """
+
+        if sig is None:
+            sig = self.signature(text)
+        signatures = self._signatures.get(group)
+        if not signatures:
+            return []
+
+        buckets = self._buckets[group]
+        candidates = {entry_id for band in self._band_keys(sig) for entry_id in buckets.get(band, ())}
+        matches = []
+        for entry_id in candidates:
+            similarity = sum(x == y for x, y in zip(sig, signatures[entry_id])) / self.num_perm
+            if similarity >= self.threshold:
+                matches.append((entry_id, similarity))
+        return sorted(matches, key=lambda match: (-match[1], match[0]))
+
+    def _band_keys(self, sig: array) -> list[tuple[int, bytes]]:
+        r = self._rows
+        return [(band, sig[band * r:(band + 1) * r].tobytes()) for band in range(self.bands)]
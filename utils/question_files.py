@@ -0,0 +1,25 @@
+import re
+
+
+def normalize_file_and_page(file_name: str, page: str) -> tuple[str, int]:
+    """
+    Converts "...._textOnlyV2.docx" ---> "....._original.pdf" as well as "page number" ---> int(number)
+
+    Args:
+        file_name (str): Filename from the Json questions database where the context comes from for the question.
+        page (str): Note of the page where the context comes from
+
+    Return:
+        (normalized_file_name: str, page_number: int)
+    """
+
+    if file_name.endswith('_textOnlyV2.docx'):
+        file_name = file_name.replace('_textOnlyV2.docx', "_original.pdf")
+
+    match = re.search(r"\d+", page)
+    if not match:
+        raise RuntimeError(f"Invalid page format: {page}")
+
+    page_number = int(match.group())
+
+    return file_name, page_number